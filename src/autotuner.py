@@ -0,0 +1,72 @@
+#! /usr/bin/python3
+
+import time
+
+import tile_model
+import wave_function_collapse
+import engine_backend
+import restart_policy
+import utils
+
+# Settings tried by tune(), only engines supported with the current config.py are tried
+CANDIDATES = [
+    {"ENGINE": engine_backend.REFERENCE, "PROPAGATION_ORDER": "LIFO", "PROPAGATION_MODE": "queue"},
+    {"ENGINE": engine_backend.REFERENCE, "PROPAGATION_ORDER": "FIFO", "PROPAGATION_MODE": "queue"},
+    {"ENGINE": engine_backend.REFERENCE, "PROPAGATION_ORDER": "LIFO", "PROPAGATION_MODE": "auto"},
+    {"ENGINE": engine_backend.DENSE, "PROPAGATION_MODE": "queue"},
+    {"ENGINE": engine_backend.DENSE, "PROPAGATION_MODE": "auto"},
+]
+
+def size_key(size: tuple) -> str:
+    return f"{size[0]}x{size[1]}"
+
+def tuned_settings(tile_model: tile_model.TileModel, size: tuple) -> dict:
+    """
+    Returns the settings tune() found for outputs of <size>, None when that size has not been tuned
+    """
+    return tile_model.tuning.get(size_key(size))
+
+def tune(tile_model: tile_model.TileModel, size: tuple, seconds: float = 2.0, periodic: bool = None, mask: list = None,
+         seed: int = 0) -> dict:
+    """
+    Run every candidate configuration for <seconds> on outputs of <size>, all starting from the same <seed>,
+    and keep the one producing the most outputs per second. The winner is stored in tile_model.tuning and
+    written next to the saved model, generate_map applies it to every later output of that size.
+    Returns the winning settings, None when no candidate finished a single output in time, the tuning
+    of that size is left as it was then
+    """
+    key = size_key(size)
+    previous = tile_model.tuning.pop(key, None)
+    best_settings, best_rate = None, 0.0
+    try:
+        for settings in CANDIDATES:
+            if not engine_backend.BACKENDS[settings["ENGINE"]].supports():
+                continue
+            # generate_map picks the candidate up like any tuned settings, config.py stays untouched
+            tile_model.tuning[key] = settings
+            generator = wave_function_collapse.WaveFunctionCollapse(tile_model, seed=seed)
+            outputs = 0
+            start = time.time()
+            while (remaining := seconds - (time.time() - start)) > 0:
+                # Trials run without the console progressbar, writing progress would be measured as well
+                if generator.generate_map(size, periodic, mask, restart_policy=restart_policy.TimeBudgetRestarts(remaining),
+                                          progress=_ignore_progress):
+                    outputs += 1
+            rate = outputs / (time.time() - start)
+            utils.verbose("Tuning %s: %s produced %.2f outputs per second", 1, key, settings, rate)
+            if rate > best_rate:
+                best_settings, best_rate = settings, rate
+    finally:
+        tile_model.tuning.pop(key, None)
+
+    if best_settings is None:
+        utils.verbose("Tuning %s: no candidate finished an output within %.2f seconds, nothing stored", 1, key, seconds)
+        if previous is not None:
+            tile_model.tuning[key] = previous
+        return None
+    tile_model.tuning[key] = dict(best_settings)
+    tile_model.save_tuning()
+    return dict(best_settings)
+
+def _ignore_progress(collapsed_tiles: int, number_of_tiles: int, elapsed: float) -> None:
+    pass
@@ -0,0 +1,248 @@
+#! /usr/bin/python3
+
+import time
+
+import numpy as np
+
+import tile_model
+import topology
+import dense_wave
+import initial_wave_cache
+import generation_result
+import instrumentation
+import config
+import utils
+
+class BatchWaveFunctionCollapse(object):
+    """
+    Generates many variants of the same size at once. The wave carries a leading batch dimension
+    (batch, rows, columns, patterns) and every observe and propagate step is a handful of NumPy
+    operations over all members still running, so the per step python overhead is shared by the
+    whole batch instead of being paid once per output.
+    Members that finished or ran into a contradiction are masked out of the following steps,
+    contradicted members are restarted in place when reseeding is enabled.
+    """
+    def __init__(self, tile_model: tile_model.TileModel, seed=None):
+        """
+        seed
+            integer seed or numpy.random.Generator all random decisions of the batch are drawn from
+        """
+        self._tile_model = tile_model
+        self._seed = seed
+        self._rng = np.random.default_rng(seed)
+        self._adjacency = dense_wave.build_adjacency(tile_model)
+
+        probabilities = np.zeros(len(tile_model.patterns))
+        weights = np.zeros(len(tile_model.patterns))
+        for pattern in tile_model.patterns:
+            probabilities[pattern.index] = pattern.probability
+            weights[pattern.index] = pattern.weight
+        # Entropy contribution of every pattern, summed over the remaining patterns of a tile
+        self._entropy_terms = -probabilities * np.log2(probabilities)
+        self._weights = weights
+
+    def generate_maps(self, size: tuple, batch_size: int, periodic: bool = None, mask: list = None,
+                      reseed: bool = True, max_tries: int = None, stop=None, pins: dict = None,
+                      progress=None, stats: instrumentation.Stats = None, propagation_mode: str = None) -> list:
+        """
+        Generate <batch_size> bitmaps of the given size at once.
+        Returns one GenerationResult per member in batch order.
+        periodic
+            the maps wrap around at their edges, defaults to config.PERIODIC_OUTPUT
+        mask
+            optional 2-dimensional list of booleans of the given size, only tiles set to True are generated
+        reseed
+            restart a member that ran into a contradiction with fresh random decisions, otherwise
+            its first contradiction ends it
+        max_tries
+            attempts per member when reseeding, defaults to config.MAX_TRIES
+        stop
+            optional callable checked before every step, when it returns True every member
+            still running is given up and its wave stored in partial_output of its result
+        pins
+            optional dictionary (row, column) -> pattern index of tiles fixed to a pattern in every member
+        progress
+            optional callable(collapsed_tiles, number_of_tiles, elapsed seconds) called after every step with the
+            tiles of the whole batch, wrap it into a progress.ThrottledProgress to limit how often it is called
+        stats
+            optional instrumentation.Stats the observe/propagate times, observations, bans and contradictions
+            of the whole batch are added to
+        propagation_mode
+            "queue", "sweep" or "auto", defaults to config.PROPAGATION_MODE
+        """
+        if periodic is None:
+            periodic = config.PERIODIC_OUTPUT
+        if max_tries is None:
+            max_tries = config.MAX_TRIES
+        if propagation_mode is None:
+            propagation_mode = config.PROPAGATION_MODE
+        utils.verbose("Generating a batch of %d maps of size %dx%d", 2, batch_size, size[0], size[1])
+        layout = topology.Topology(size, periodic, mask)
+        height, width = layout.height, layout.width
+        number_of_patterns = len(self._tile_model.patterns)
+        active = np.ones((height, width), dtype=bool)
+        if layout.mask is not None:
+            active = np.frombuffer(bytes(layout.mask), dtype=np.uint8).reshape(height, width).astype(bool)
+
+        results = [generation_result.GenerationResult(size) for _ in range(batch_size)]
+        number_of_tiles = int(active.sum())
+        running = np.ones(batch_size, dtype=bool)
+        steps = np.zeros(batch_size, dtype=int)
+        attempt_starts = np.full(batch_size, time.time())
+        start = time.time()
+
+        # Every member starts from the same wave with the pins applied and propagated, tiles outside of the
+        # mask don't contain any pattern like in the reference engine, both share the cached initial waves
+        initial = np.ones((1, height, width, number_of_patterns), dtype=bool)
+        initial[0, ~active] = False
+        if pins:
+            key = initial_wave_cache.constraints_key(layout.size, periodic, None if layout.mask is None else bytes(layout.mask),
+                                                     {layout.index(position): pattern_index for position, pattern_index in pins.items()})
+            cached = initial_wave_cache.initial_waves.get(self._tile_model, key)
+            if cached is not None:
+                initial = cached.reshape(initial.shape)
+            else:
+                initial = self._apply_pins(initial, pins, periodic, active, propagation_mode)
+                if initial is None:
+                    utils.verbose("Pinned tiles contradict each other", 2)
+                    for result in results:
+                        self._record(result, False, 0, 0, None, start, "Pinned tiles contradict each other")
+                        result.elapsed = time.time() - start
+                    return results
+                initial_wave_cache.initial_waves.put(self._tile_model, key, initial.reshape(height * width, number_of_patterns))
+        wave = np.repeat(initial, batch_size, axis=0)
+
+        while running.any():
+            members = np.flatnonzero(running)
+            counts = wave[members].sum(axis=3)
+            if progress is not None:
+                succeeded = sum(result.success for result in results)
+                progress(succeeded * number_of_tiles + int(((counts == 1) & active).sum()), batch_size * number_of_tiles, time.time() - start)
+
+            # Members without any open tile are done
+            open_tiles = (counts > 1) & active
+            finished = ~open_tiles.reshape(len(members), -1).any(axis=1)
+            for position in np.flatnonzero(finished):
+                member = members[position]
+                self._record(results[member], True, steps[member], number_of_tiles, None, attempt_starts[member])
+                results[member].output = self._to_output(wave[member], active)
+                running[member] = False
+            members, counts, open_tiles = members[~finished], counts[~finished], open_tiles[~finished]
+            if len(members) == 0:
+                break
+            if stop is not None and stop():
+                for member in members:
+                    collapsed = int(((wave[member].sum(axis=2) == 1) & active).sum())
+                    self._record(results[member], False, steps[member], collapsed, None, attempt_starts[member], "Stopped")
+                    results[member].partial_output = self._to_partial_output(wave[member], active)
+                break
+
+            # Observe the open tile with the least entropy in every running member
+            observe_start = time.perf_counter()
+            entropy = wave[members].astype(np.float64) @ self._entropy_terms
+            entropy -= self._rng.random(entropy.shape) * config.ENTROPY_NOISE
+            entropy[~open_tiles] = np.inf
+            cells = entropy.reshape(len(members), -1).argmin(axis=1)
+            rows, cols = np.divmod(cells, width)
+
+            weights = wave[members, rows, cols] * self._weights
+            if config.USE_MAX_PROBABILITY:
+                weights[weights < weights.max(axis=1, keepdims=True)] = 0
+            cumulative_weights = weights.cumsum(axis=1)
+            thresholds = self._rng.random(len(members)) * cumulative_weights[:, -1]
+            chosen = (cumulative_weights > thresholds[:, None]).argmax(axis=1)
+
+            wave[members, rows, cols] = False
+            wave[members, rows, cols, chosen] = True
+            steps[members] += 1
+            changed = np.zeros((batch_size, height, width), dtype=bool)
+            changed[members, rows, cols] = True
+
+            if stats is None:
+                contradicted = self._propagate(wave, changed, members, periodic, active, propagation_mode)
+            else:
+                propagate_start = time.perf_counter()
+                # Patterns left in the running members, the difference after propagating are the bans
+                remaining = int(counts.sum())
+                contradicted = self._propagate(wave, changed, members, periodic, active, propagation_mode)
+                stats.times[instrumentation.OBSERVE] += propagate_start - observe_start
+                stats.times[instrumentation.PROPAGATE] += time.perf_counter() - propagate_start
+                stats.observations += len(members)
+                stats.bans += remaining - int(wave[members].sum())
+                stats.contradictions += int(contradicted.sum())
+            for member in np.flatnonzero(contradicted):
+                empty = np.argwhere(~wave[member].any(axis=2) & active)[0]
+                collapsed = int(((wave[member].sum(axis=2) == 1) & active).sum())
+                self._record(results[member], False, steps[member], collapsed, tuple(int(axis) for axis in empty),
+                             attempt_starts[member], "Contradiction")
+                if reseed and len(results[member].attempts) < max_tries:
+                    utils.verbose("Member %d ran into a contradiction, try again [%d]", 2, member, len(results[member].attempts))
+                    wave[member] = initial[0]
+                    steps[member] = 0
+                    attempt_starts[member] = time.time()
+                else:
+                    running[member] = False
+
+        elapsed = time.time() - start
+        for result in results:
+            result.elapsed = elapsed
+        return results
+
+    def _apply_pins(self, wave: np.ndarray, pins: dict, periodic: bool, active: np.ndarray, propagation_mode: str) -> np.ndarray:
+        """
+        Fix the pinned tiles of a single member <wave> and propagate them, returns None on a contradiction
+        """
+        _, height, width, _ = wave.shape
+        changed = np.zeros((1, height, width), dtype=bool)
+        for (row, col), pattern_index in pins.items():
+            if not active[row, col]:
+                raise ValueError(f"Pinned tile {(row, col)} is not part of the output")
+            wave[0, row, col] = False
+            wave[0, row, col, pattern_index] = True
+            changed[0, row, col] = True
+        if self._propagate(wave, changed, np.arange(1), periodic, active, propagation_mode)[0]:
+            return None
+        return wave
+
+    def _propagate(self, wave: np.ndarray, changed: np.ndarray, members: np.ndarray, periodic: bool, active: np.ndarray,
+                   propagation_mode: str) -> np.ndarray:
+        """
+        Propagate the <changed> tiles of the running <members> as selected by <propagation_mode>,
+        returns which members of the batch ran into a contradiction
+        """
+        if propagation_mode == "sweep":
+            contradicted = np.zeros(len(wave), dtype=bool)
+            contradicted[members] = dense_wave.propagate_sweep(wave, self._adjacency, periodic, active, members)
+            return contradicted
+        sweep_threshold = config.SWEEP_THRESHOLD if propagation_mode == "auto" else None
+        return dense_wave.propagate_frontier(wave, changed, self._adjacency, periodic, active, sweep_threshold)
+
+    def _record(self, result: generation_result.GenerationResult, success: bool, steps: int, collapsed_tiles: int,
+                contradiction_position: tuple, attempt_start: float, reason: str = "") -> None:
+        result.success = success
+        result.attempts.append(generation_result.AttemptStatistics(
+            number=len(result.attempts) + 1,
+            success=success,
+            steps=int(steps),
+            collapsed_tiles=collapsed_tiles,
+            contradiction_position=contradiction_position,
+            backtracks=0,
+            repairs=0,
+            elapsed=time.time() - attempt_start,
+            reason=reason,
+        ))
+
+    def _to_output(self, wave: np.ndarray, active: np.ndarray) -> list:
+        """
+        Convert the collapsed wave of a single member into possible patterns per tile as 2-dimensional list
+        """
+        indices = np.where(active, wave.argmax(axis=2), -1)
+        return self._tile_model.from_indices(indices.tolist())
+
+    def _to_partial_output(self, wave: np.ndarray, active: np.ndarray) -> list:
+        """
+        Convert the wave of a single member that has not collapsed yet into possible patterns per tile
+        """
+        patterns = self._tile_model.patterns
+        return [[[patterns[index] for index in np.flatnonzero(wave[row, col])] if active[row, col] else []
+                 for col in range(wave.shape[1])] for row in range(wave.shape[0])]
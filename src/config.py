@@ -11,9 +11,75 @@ ENTROPY_NOISE = 0.01
 # When set to True only choose between patterns with the maximum probability during collapse
 USE_MAX_PROBABILITY = False
 
+# Number of distinct pattern sets a tile can be left with whose sampling tables are cached
+# during collapse, the least recently used are dropped first, default=1024
+SAMPLER_CACHE_SIZE = 1024
+
+# Number of starting waves with pinned tiles and learned nogoods already propagated that are kept per
+# tile model, so retries don't propagate the same constraints again. 0 disables the cache, default=16
+INITIAL_WAVE_CACHE_SIZE = 16
+
+# Order in which changed tiles are visited during propagation, either "LIFO"(depth first)
+# or "FIFO"(breadth first). Both produce the same result, only the amount of work differs, default="LIFO"
+PROPAGATION_ORDER = "LIFO"
+
+# How constraints are propagated after a change, "queue" follows the changed tiles one by one,
+# "sweep" recomputes every tile of the output at once with NumPy until nothing changes anymore,
+# "auto" starts with the queue and switches to a sweep once a single propagation has visited
+# more than SWEEP_THRESHOLD of all tiles. All modes produce the same result, default="queue"
+PROPAGATION_MODE = "queue"
+
+# Fraction of all tiles a propagation may visit before "auto" switches to a sweep, default=0.25
+SWEEP_THRESHOLD = 0.25
+
+# Engine generate_map runs on, "reference"(pure python, supports every option), "dense"(NumPy wave,
+# only with the "restart" contradiction strategy and without nogood learning) or "auto" which picks
+# the supported engine estimated to be the fastest for the tile model and output size, default="auto"
+ENGINE = "auto"
+
+# When set to True the output wraps around, tiles on one edge are adjacent to the tiles
+# on the opposite edge which makes the output tileable, default=False
+PERIODIC_OUTPUT = False
+
 # Maximum Number of tries the algorithm gets before terminating
 MAX_TRIES = 3
 
+# What to do when a tile runs out of possible patterns, default="restart"
+# "restart"   throw away the whole map and start from scratch
+# "backtrack" undo the map to the last decision, exclude the pattern chosen there and continue,
+#             the map is only thrown away when MAX_BACKTRACKS is exceeded
+# "repair"    only reset a REPAIR_BLOCK_SIZE sized block around the failing tile and generate it again
+#             constrained by the tiles around it, the map is only thrown away when MAX_REPAIRS is exceeded
+CONTRADICTION_STRATEGY = "restart"
+
+# Maximum number of undone decisions per try when backtracking
+MAX_BACKTRACKS = 1000
+
+# Width/height of the block that is reset around a failing tile when repairing, when the same block
+# fails again it grows by 2 up to REPAIR_MAX_BLOCK_SIZE
+REPAIR_BLOCK_SIZE = 5
+REPAIR_MAX_BLOCK_SIZE = 21
+
+# Maximum number of repaired blocks per try
+MAX_REPAIRS = 1000
+
+# When set to True every contradiction is analyzed and the configuration of neighboring patterns
+# that caused it is remembered(independent of its position) as nogood. Later tries and every other
+# output generated from the same tile model ban patterns that would complete a nogood, default=False
+LEARN_NOGOODS = False
+
+# Maximum number of nogoods remembered per tile model, the least recently used are dropped first
+NOGOOD_CAPACITY = 1000
+
+# Nogoods are searched for and checked within this distance around the failing tile,
+# only nogoods with at most NOGOOD_MAX_SIZE patterns are remembered
+NOGOOD_RADIUS = 3
+NOGOOD_MAX_SIZE = 4
+
+# Minimum seconds between two progress reports of generate_map(console progressbar or progress callback),
+# see progress.ThrottledProgress to report by percentage instead, default=0.1
+PROGRESS_INTERVAL = 0.1
+
 # The higher the level the more info is printed to the user, default=1, !maximum=3 
 # Level intentions:
 # 0 Off
@@ -22,6 +88,11 @@ MAX_TRIES = 3
 # 3 Get all steps the algorithm takes, include "private" methods 
 DEBUG_LEVEL = 1
 
+# Messages are logged with the logging module to the "wave_function_collapse" logger(levels 1-3 as INFO,
+# DEBUG and TRACE). When set to True they are written to stdout, otherwise they are passed on to the
+# handlers configured by the application, default=True
+LOG_TO_CONSOLE = True
+
 # Automatically save translated_image/tile_model as they are static for given input
 # and theres no need to create them multiple times. On the other hand translatation/modeling
 # doesn't really take much resources...
@@ -0,0 +1,125 @@
+#! /usr/bin/python3
+
+import numpy as np
+
+import directions
+
+def build_adjacency(tile_model) -> np.ndarray:
+    """
+    Dense form of tile_model.compatibility as boolean array of shape (directions, patterns, patterns)
+    adjacency[direction_index, pattern_index, adjacent_pattern_index] is True when the adjacent pattern
+    is allowed next to the pattern in that direction
+    """
+    number_of_patterns = len(tile_model.patterns)
+    number_of_bytes = (number_of_patterns + 7) // 8
+    masks = b"".join(mask.to_bytes(number_of_bytes, "little") for masks in tile_model.compatibility for mask in masks)
+    bits = np.unpackbits(np.frombuffer(masks, dtype=np.uint8), bitorder="little")
+    return bits.reshape(len(tile_model.compatibility), number_of_patterns, -1)[..., :number_of_patterns].astype(bool)
+
+
+def propagate_frontier(wave: np.ndarray, changed: np.ndarray, adjacency: np.ndarray, periodic: bool = False,
+                       active: np.ndarray = None, sweep_threshold: float = None) -> np.ndarray:
+    """
+    Propagate every changed tile of a batch of waves at once, layer by layer until nothing changes anymore.
+    wave:-------boolean array (batch, rows, columns, patterns), narrowed in place
+    changed:----boolean array (batch, rows, columns) of the tiles to propagate from, consumed
+    adjacency:--see build_adjacency
+    periodic:---the waves wrap around at their edges
+    active:-----optional boolean array (rows, columns), tiles set to False are not part of the output
+    sweep_threshold:--optional fraction of all tiles, once that many tiles changed in a single layer
+                      the remaining propagation is done by propagate_sweep
+    Returns a boolean array (batch,) telling which members ran into a contradiction, those are not
+    propagated any further
+    """
+    batch_size, height, width, _ = wave.shape
+    offsets = [direction.value for direction in directions.Directions]
+    weights = adjacency.astype(np.float32)
+    contradicted = np.zeros(batch_size, dtype=bool)
+    while True:
+        members, rows, cols = np.nonzero(changed)
+        if len(members) == 0:
+            return contradicted
+        if sweep_threshold is not None and len(members) > sweep_threshold * changed.size:
+            running = np.flatnonzero(changed.any(axis=(1, 2)))
+            contradicted[running] |= propagate_sweep(wave, adjacency, periodic, active, running)
+            return contradicted
+        values = wave[members, rows, cols].astype(np.float32)
+        changed = np.zeros((batch_size, height, width), dtype=bool)
+        for direction_index, (row_offset, col_offset) in enumerate(offsets):
+            adjacent_rows, adjacent_cols = rows + row_offset, cols + col_offset
+            if periodic:
+                adjacent_rows %= height
+                adjacent_cols %= width
+                valid = np.ones(len(members), dtype=bool)
+            else:
+                valid = (adjacent_rows >= 0) & (adjacent_rows < height) & (adjacent_cols >= 0) & (adjacent_cols < width)
+            if active is not None:
+                valid[valid] = active[adjacent_rows[valid], adjacent_cols[valid]]
+
+            # Every tile has exactly one neighbor per direction, targets within a direction are distinct
+            target = (members[valid], adjacent_rows[valid], adjacent_cols[valid])
+            before = wave[target]
+            after = before & ((values[valid] @ weights[direction_index]) > 0)
+            narrowed = (before != after).any(axis=1)
+            if narrowed.any():
+                target = tuple(axis[narrowed] for axis in target)
+                after = after[narrowed]
+                wave[target] = after
+                changed[target] = True
+                contradicted[target[0][~after.any(axis=1)]] = True
+        changed[contradicted] = False
+
+
+def propagate_sweep(wave: np.ndarray, adjacency: np.ndarray, periodic: bool = False, active: np.ndarray = None,
+                    members: np.ndarray = None) -> np.ndarray:
+    """
+    Propagate a batch of waves by sweeping over every tile at once instead of following changed tiles.
+    Each sweep computes the patterns allowed next to every tile in every direction with a single matrix
+    product of the whole wave against the adjacency tensor, shifts the masks by the direction offsets
+    and intersects them into the wave, until a sweep does not change anything anymore.
+    Reaches the same result as propagate_frontier, but pays off when most of the grid changes.
+    wave, adjacency, periodic, active:--see propagate_frontier
+    members:----------------------------optional indices of the batch members to sweep, all by default
+    Returns a boolean array (members,) telling which of the swept members ran into a contradiction
+    """
+    if members is None:
+        members = np.arange(wave.shape[0])
+    swept = wave[members]
+    number_of_directions, number_of_patterns, _ = adjacency.shape
+    # (patterns, directions * patterns), a single product yields the masks of all directions
+    weights = adjacency.transpose(1, 0, 2).reshape(number_of_patterns, -1).astype(np.float32)
+    offsets = [direction.value for direction in directions.Directions]
+
+    remaining = swept.sum()
+    while True:
+        allowed = (swept.astype(np.float32) @ weights) > 0
+        allowed = allowed.reshape(swept.shape[:3] + (number_of_directions, number_of_patterns))
+        if active is not None:
+            allowed[:, ~active] = True
+        # Tiles without any pattern left must not empty their neighbors as well
+        allowed[~swept.any(axis=3)] = True
+        for direction_index, (row_offset, col_offset) in enumerate(offsets):
+            swept &= _shift(allowed[..., direction_index, :], row_offset, col_offset, periodic)
+        previous, remaining = remaining, swept.sum()
+        if remaining == previous:
+            break
+
+    wave[members] = swept
+    empty = ~swept.any(axis=3)
+    if active is not None:
+        empty &= active
+    return empty.reshape(len(members), -1).any(axis=1)
+
+
+def _shift(masks: np.ndarray, row_offset: int, col_offset: int, periodic: bool) -> np.ndarray:
+    """
+    Move the masks (batch, rows, columns, patterns) computed per tile onto the tile at the given offset,
+    tiles without a tile at the opposite offset are not restricted
+    """
+    if periodic:
+        return np.roll(masks, (row_offset, col_offset), axis=(1, 2))
+    _, height, width, _ = masks.shape
+    shifted = np.ones_like(masks)
+    shifted[:, max(row_offset, 0):height + min(row_offset, 0), max(col_offset, 0):width + min(col_offset, 0)] = \
+        masks[:, max(-row_offset, 0):height - max(row_offset, 0), max(-col_offset, 0):width - max(col_offset, 0)]
+    return shifted
@@ -0,0 +1,153 @@
+#! /usr/bin/python3
+
+import os
+import time
+import multiprocessing
+import concurrent.futures
+
+import numpy as np
+
+import tile_model
+import wave_function_collapse
+import restart_policy as restart_policy_module
+import generation_result
+import instrumentation
+import config
+import utils
+
+def generate_decomposed(tile_model: tile_model.TileModel, size: tuple, block_size: tuple = (64, 64), workers: int = None,
+                        seed: int = None, max_regrowths: int = 3,
+                        restart_policy: restart_policy_module.RestartPolicy = None) -> generation_result.GenerationResult:
+    """
+    Generate a single large output by splitting it into blocks of <block_size> and generating the blocks
+    in four phases, a block's phase depends on whether its row and column are even or odd. Blocks of the
+    same phase never touch, not even diagonally, so every phase runs in a pool of <workers> processes
+    (os.cpu_count() by default). Every block is constrained by the tiles fixed around it in earlier phases.
+    A block that can't be fitted to its surroundings is regenerated together with the fixed tiles around it,
+    the window growing by half a block up to <max_regrowths> times. <restart_policy> applies to every single
+    block and window(config.MAX_TRIES attempts by default).
+    Returns a GenerationResult whose output holds the pattern indices as array (rows, columns),
+    tile_model.from_indices(result.output.tolist()) turns it into pattern lists. The output never wraps around.
+    """
+    height, width = size
+    block_height, block_width = block_size
+    workers = workers or os.cpu_count() or 1
+    utils.verbose("Generating %dx%d output in %dx%d blocks on %d workers", 1, height, width, block_height, block_width, workers)
+    result = generation_result.GenerationResult(size, seed)
+    result.stats = instrumentation.Stats()
+    start = time.time()
+    indices = np.full((height, width), -1, dtype=np.int32)
+    seed_sequence = np.random.SeedSequence(seed)
+
+    blocks = [(top, left, min(block_height, height - top), min(block_width, width - left))
+              for top in range(0, height, block_height) for left in range(0, width, block_width)]
+    # Every block gets its own seed, so the output doesn't depend on the number of workers
+    block_seeds = dict(zip(blocks, seed_sequence.spawn(len(blocks))))
+    phases = [[block for block in blocks if (block[0] // block_height % 2, block[1] // block_width % 2) == phase]
+              for phase in ((0, 0), (0, 1), (1, 0), (1, 1))]
+
+    executor = None
+    if workers > 1:
+        settings = {name: getattr(config, name) for name in dir(config) if name.isupper()}
+        executor = concurrent.futures.ProcessPoolExecutor(workers, initializer=wave_function_collapse._init_worker,
+                                                          initargs=(tile_model, multiprocessing.Event(), settings))
+    generator = wave_function_collapse.WaveFunctionCollapse(tile_model)
+    try:
+        for number, phase in enumerate(phases, 1):
+            utils.verbose("Phase %d: generating %d blocks", 2, number, len(phase))
+            problems = {block: _window_problem(indices, block, np.ones(block[2:], dtype=bool)) for block in phase}
+            if executor is not None:
+                futures = {}
+                for block, (window_size, mask, pins) in problems.items():
+                    futures[block] = executor.submit(wave_function_collapse._run_job, window_size, False, mask, block_seeds[block], restart_policy, pins)
+                solutions = {block: future.result() for block, future in futures.items()}
+            else:
+                solutions = {block: _solve(generator, *problems[block], block_seeds[block], restart_policy) for block in phase}
+
+            failed = []
+            for block in phase:
+                _collect(result, solutions[block])
+                if solutions[block]:
+                    _write(indices, block, solutions[block].output)
+                else:
+                    failed.append(block)
+            for block in failed:
+                if not _regrow(generator, result, indices, block, block_seeds[block], max_regrowths, restart_policy):
+                    result.elapsed = time.time() - start
+                    return result
+    finally:
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    result.success = True
+    result.output = indices
+    result.elapsed = time.time() - start
+    return result
+
+def _regrow(generator: wave_function_collapse.WaveFunctionCollapse, result: generation_result.GenerationResult,
+            indices: np.ndarray, block: tuple, seed: np.random.SeedSequence, max_regrowths: int,
+            restart_policy: restart_policy_module.RestartPolicy) -> bool:
+    """
+    Regenerate <block> together with the already fixed tiles within a margin around it, the margin
+    grows by half a block per try. Returns False when the block still doesn't fit
+    """
+    top, left, block_height, block_width = block
+    height, width = indices.shape
+    for growth, window_seed in enumerate(seed.spawn(max_regrowths), 1):
+        margin_rows, margin_cols = growth * block_height // 2, growth * block_width // 2
+        window_top, window_left = max(0, top - margin_rows), max(0, left - margin_cols)
+        window_bottom, window_right = min(height, top + block_height + margin_rows), min(width, left + block_width + margin_cols)
+        window = (window_top, window_left, window_bottom - window_top, window_right - window_left)
+        utils.verbose("Regenerating block at %s within %dx%d window", 2, (top, left), window[2], window[3])
+
+        open_tiles = indices[window_top:window_bottom, window_left:window_right] >= 0
+        open_tiles[top - window_top:top - window_top + block_height, left - window_left:left - window_left + block_width] = True
+        solution = _solve(generator, *_window_problem(indices, window, open_tiles), window_seed, restart_policy)
+        _collect(result, solution)
+        if solution:
+            solved = np.array(solution.output)
+            region = indices[window_top:window_bottom, window_left:window_right]
+            region[open_tiles] = solved[1:-1, 1:-1][open_tiles]
+            return True
+    return False
+
+def _window_problem(indices: np.ndarray, window: tuple, open_tiles: np.ndarray) -> tuple:
+    """
+    Describe generating the <open_tiles> of <window> as (size, mask, pins) for generate_map. The window gets
+    a ring of one tile, ring tiles already fixed in <indices> are pinned, all other tiles are masked out
+    """
+    top, left, window_height, window_width = window
+    height, width = indices.shape
+    mask = [[False] * (window_width + 2) for _ in range(window_height + 2)]
+    pins = {}
+    for row in range(window_height + 2):
+        for col in range(window_width + 2):
+            if 0 < row <= window_height and 0 < col <= window_width:
+                mask[row][col] = bool(open_tiles[row - 1, col - 1])
+                continue
+            map_row, map_col = top + row - 1, left + col - 1
+            if 0 <= map_row < height and 0 <= map_col < width and indices[map_row, map_col] >= 0:
+                mask[row][col] = True
+                pins[(row, col)] = int(indices[map_row, map_col])
+    return (window_height + 2, window_width + 2), mask, pins
+
+def _solve(generator: wave_function_collapse.WaveFunctionCollapse, size: tuple, mask: list, pins: dict,
+           seed: np.random.SeedSequence, restart_policy: restart_policy_module.RestartPolicy) -> generation_result.GenerationResult:
+    """
+    Solve a window problem in this process, the output is returned as pattern indices like _run_job does
+    """
+    generator.reseed(seed)
+    solution = generator.generate_map(size, False, mask, restart_policy=restart_policy, pins=pins)
+    if solution.output is not None:
+        solution.output = generator._tile_model.to_indices(solution.output)
+    return solution
+
+def _collect(result: generation_result.GenerationResult, solution: generation_result.GenerationResult) -> None:
+    result.stats.merge(solution.stats)
+    for attempt in solution.attempts:
+        attempt.number = len(result.attempts) + 1
+        result.attempts.append(attempt)
+
+def _write(indices: np.ndarray, block: tuple, output: list) -> None:
+    top, left, block_height, block_width = block
+    indices[top:top + block_height, left:left + block_width] = np.array(output)[1:-1, 1:-1]
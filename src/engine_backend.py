@@ -0,0 +1,145 @@
+#! /usr/bin/python3
+
+import time
+
+import tile_model
+import batch_wave_function_collapse
+import generation_result
+import config
+import utils
+
+# Engine names, see config.ENGINE
+REFERENCE = "reference"
+DENSE = "dense"
+AUTO = "auto"
+
+class EngineBackend(object):
+    """
+    An engine WaveFunctionCollapse.generate_map can run on. Every backend follows the same rules,
+    uses the random generator of the WaveFunctionCollapse instance and returns a GenerationResult,
+    they only differ in how fast they are for a given tile model and output size
+    """
+    name = ""
+
+    def supports(self) -> bool:
+        """
+        Returns True when the backend can run with the current config.py settings
+        """
+        return True
+
+    def estimate_cost(self, statistics: dict, number_of_tiles: int) -> float:
+        """
+        Rough estimate of the seconds a single attempt takes, only used to compare backends
+        statistics:--see model_statistics
+        """
+        raise NotImplementedError()
+
+    def generate_map(self, generator, size: tuple, periodic: bool, mask: list, pins: dict, policy) -> generation_result.GenerationResult:
+        raise NotImplementedError()
+
+
+class ReferenceBackend(EngineBackend):
+    """
+    The pure python engine of WaveFunctionCollapse itself, supports every contradiction strategy and nogood
+    learning. Every step scans all tiles for the least entropy, so its cost grows quadratically with the size
+    and steeply with the number of patterns a pattern allows next to it
+    """
+    name = REFERENCE
+
+    def estimate_cost(self, statistics: dict, number_of_tiles: int) -> float:
+        # Fitted to measured attempts on the bundled models
+        neighbours = statistics["number_of_patterns"] * statistics["rule_density"]
+        return number_of_tiles * number_of_tiles * 7.4e-9 * neighbours ** 3.37
+
+    def generate_map(self, generator, size: tuple, periodic: bool, mask: list, pins: dict, policy) -> generation_result.GenerationResult:
+        return generator._generate_map_reference(size, policy)
+
+
+class DenseBackend(EngineBackend):
+    """
+    Runs every attempt as a batch of one on BatchWaveFunctionCollapse, a boolean NumPy wave observed and
+    propagated with array operations. Pays a higher cost per tile but scales far better with the size, it
+    only wins from roughly 200 tiles on dense rule sets and later on sparse ones.
+    Only contradictions ending the attempt are supported
+    """
+    name = DENSE
+
+    def supports(self) -> bool:
+        return config.CONTRADICTION_STRATEGY == "restart" and not config.LEARN_NOGOODS
+
+    def estimate_cost(self, statistics: dict, number_of_tiles: int) -> float:
+        # Fitted to measured attempts on the bundled models
+        neighbours = statistics["number_of_patterns"] * statistics["rule_density"]
+        return number_of_tiles * 1.19e-4 * neighbours * (1 + number_of_tiles / 6000)
+
+    def generate_map(self, generator, size: tuple, periodic: bool, mask: list, pins: dict, policy) -> generation_result.GenerationResult:
+        engine = batch_wave_function_collapse.BatchWaveFunctionCollapse(generator._tile_model, seed=generator._rng)
+        result = generation_result.GenerationResult(size, generator._seed)
+        # Called once before every step, so the calls count the steps over all attempts
+        steps = 0
+        message = None
+        def stop() -> bool:
+            nonlocal steps, message
+            if policy.expired():
+                return True
+            if (reason := generator._stop_reason()) is not None:
+                result.stopped = reason.status
+                message = str(reason)
+            elif generator._max_steps is not None and steps >= generator._max_steps:
+                result.stopped = generation_result.STEP_LIMIT
+                message = "Step limit reached"
+            steps += 1
+            return result.stopped is not None
+
+        start = time.time()
+        for number, _ in enumerate(policy.attempts(), 1):
+            attempt, = engine.generate_maps(size, 1, periodic, mask, reseed=False, stop=stop, pins=pins, progress=generator._progress,
+                                            stats=generator._stats, propagation_mode=generator._propagation_mode)
+            statistics = attempt.attempts[0]
+            statistics.number = number
+            result.attempts.append(statistics)
+            if attempt.success:
+                result.success = True
+                result.output = attempt.output
+                generator._adopt_output(result.output)
+                break
+            if result.stopped is not None:
+                statistics.reason = message
+                result.partial_output = attempt.partial_output
+                break
+            utils.verbose("Unsolvable, try again [%d]", 1, number)
+            if policy.expired():
+                break
+        result.elapsed = time.time() - start
+        return result
+
+
+BACKENDS = {backend.name: backend for backend in (ReferenceBackend(), DenseBackend())}
+
+def model_statistics(tile_model: tile_model.TileModel) -> dict:
+    """
+    Statistics of <tile_model> the backends base their cost estimates on
+        number_of_patterns:--number of distinct patterns
+        rule_density:--------fraction of all (direction, pattern, pattern) combinations that are allowed
+    """
+    number_of_patterns = len(tile_model.patterns)
+    allowed = sum(bin(mask).count("1") for masks in tile_model.compatibility for mask in masks)
+    return {
+        "number_of_patterns": number_of_patterns,
+        "rule_density": allowed / max(1, len(tile_model.compatibility) * number_of_patterns ** 2),
+    }
+
+def get_backend(name: str, tile_model: tile_model.TileModel, number_of_tiles: int) -> EngineBackend:
+    """
+    Returns the backend called <name>, for "auto" the supported backend with the lowest estimated cost
+    for an output with <number_of_tiles> tiles
+    """
+    if name != AUTO:
+        if name not in BACKENDS:
+            raise ValueError(f"Unknown engine <{name}>, expected one of {[AUTO] + list(BACKENDS)}")
+        return BACKENDS[name]
+    statistics = model_statistics(tile_model)
+    candidates = [backend for backend in BACKENDS.values() if backend.supports()]
+    backend = min(candidates, key=lambda backend: backend.estimate_cost(statistics, number_of_tiles))
+    utils.verbose("Selected %s engine for %d tiles and %d patterns", 2, backend.name, number_of_tiles, statistics["number_of_patterns"])
+    return backend
@@ -0,0 +1,114 @@
+#! /usr/bin/python3
+
+# Values of GenerationResult.status
+SUCCESS = "success"
+FAILED = "failed"
+TIMEOUT = "timeout"
+STEP_LIMIT = "step_limit"
+STOPPED = "stopped"
+
+class AttemptStatistics(object):
+    """
+    What happened during a single attempt of generating an output
+        number:------------------1 for the first attempt, 2 for the second, ...
+        success:-----------------True when the attempt produced a valid output
+        steps:-------------------tiles collapsed by choice(observe/propagate steps)
+        collapsed_tiles:---------tiles with a single pattern left when the attempt ended
+        contradiction_position:--(row, column) of the last tile that ran out of patterns, None without contradiction
+        backtracks/repairs:------number of recovered contradictions
+        elapsed:-----------------wall time of the attempt in seconds
+        reason:------------------why the attempt failed, empty on success
+    """
+    def __init__(self, number: int, success: bool, steps: int, collapsed_tiles: int, contradiction_position: tuple,
+                 backtracks: int, repairs: int, elapsed: float, reason: str = ""):
+        self.number = number
+        self.success = success
+        self.steps = steps
+        self.collapsed_tiles = collapsed_tiles
+        self.contradiction_position = contradiction_position
+        self.backtracks = backtracks
+        self.repairs = repairs
+        self.elapsed = elapsed
+        self.reason = reason
+
+    def as_dict(self) -> dict:
+        return dict(vars(self))
+
+    def __repr__(self):
+        return f"AttemptStatistics({', '.join(f'{key}={value!r}' for key, value in vars(self).items())})"
+
+
+class GenerationResult(object):
+    """
+    Outcome of generate_map, evaluates to True when an output has been generated.
+        output:-----------possible patterns per tile as 2-dimensional list(row, column), None on failure
+        attempts:---------list of AttemptStatistics, one per attempt in order
+        elapsed:----------total wall time in seconds
+        seed:-------------seed the generator has been created with, passing it again reproduces the output
+        stopped:----------TIMEOUT, STEP_LIMIT or STOPPED when the generation has been ended early, None otherwise
+        partial_output:---possible patterns per tile of the attempt ended early like output, None otherwise
+        stats:------------instrumentation.Stats of the run(phase times and counters), None when not collected
+    """
+    def __init__(self, size: tuple, seed=None):
+        self.size = tuple(size)
+        self.seed = seed
+        self.success = False
+        self.output = None
+        self.attempts = []
+        self.elapsed = 0.0
+        self.stopped = None
+        self.partial_output = None
+        self.stats = None
+
+    @property
+    def number_of_attempts(self) -> int:
+        return len(self.attempts)
+
+    @property
+    def status(self) -> str:
+        """
+        SUCCESS, FAILED when every attempt ran into a contradiction or the restart policy gave up,
+        otherwise why the generation has been ended early
+        """
+        if self.success:
+            return SUCCESS
+        return self.stopped or FAILED
+
+    def as_dict(self) -> dict:
+        return {
+            "size": self.size,
+            "seed": self.seed,
+            "success": self.success,
+            "status": self.status,
+            "elapsed": self.elapsed,
+            "attempts": [attempt.as_dict() for attempt in self.attempts],
+            "stats": None if self.stats is None else self.stats.as_dict(),
+        }
+
+    def __bool__(self):
+        return self.success
+
+    def __repr__(self):
+        return f"GenerationResult(size={self.size}, status={self.status}, attempts={len(self.attempts)}, elapsed={self.elapsed:.2f})"
+
+
+class StepEvent(object):
+    """
+    A single observe/propagate step made by iter_generate
+        attempt:----------------number of the attempt the step belongs to, whenever it changes the output has been reset
+        step:-------------------number of tiles collapsed by choice in the attempt so far
+        position:---------------(row, column) of the tile collapsed by the step, None when the step backtracked or repaired
+        changed:----------------(row, column) of every tile whose possible patterns changed during the step
+        collapsed_tiles:--------tiles with a single pattern left after the step
+        number_of_tiles:--------tiles to collapse in total
+    """
+    def __init__(self, attempt: int, step: int, position: tuple, changed: list, collapsed_tiles: int, number_of_tiles: int):
+        self.attempt = attempt
+        self.step = step
+        self.position = position
+        self.changed = changed
+        self.collapsed_tiles = collapsed_tiles
+        self.number_of_tiles = number_of_tiles
+
+    def __repr__(self):
+        return f"StepEvent(attempt={self.attempt}, step={self.step}, position={self.position}, changed={len(self.changed)} tiles)"
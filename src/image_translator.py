@@ -1,8 +1,11 @@
 #! /usr/bin/python3
 
+import time
+
 from PIL import Image
 import numpy as np
 
+import instrumentation
 import utils
 
 class Tile(object):
@@ -28,6 +31,8 @@ class ImageTranslator(object):
     def __init__(self) -> None:
         self.translated_image = []
         self.translation_map = []
+        # instrumentation.Stats of the last breakdown_image
+        self.stats = instrumentation.Stats()
 
     def __str__(self):
         result = "Translated Image"
@@ -48,7 +53,8 @@ class ImageTranslator(object):
         raise NotImplementedError()
 
     def breakdown_image(self, image_path: str, tile_size: int) -> None:  
-        utils.verbose(f"breaking down {image_path} into tiles of size {tile_size}", 1)
+        utils.verbose("breaking down %s into tiles of size %d", 1, image_path, tile_size)
+        start = time.perf_counter()
         image = Image.open(image_path)
         self.__init__()
         if image.width / tile_size != image.width // tile_size and image.height / tile_size != image.height // tile_size:
@@ -69,13 +75,14 @@ class ImageTranslator(object):
                 self.translated_image[-1].append(self.translation_map.index(tile))
         
         self.translation_map = list(map(lambda x: Tile(x), self.translation_map))
-        utils.verbose(f"Brokedown image into {len(self.translation_map)} different tiles", 1)
+        self.stats.times[instrumentation.TRANSLATE] = time.perf_counter() - start
+        utils.verbose("Brokedown image into %d different tiles", 1, len(self.translation_map))
         utils.verbose(self, 3)
         return self
 
     
     def rebuild_image(self, bitmap: list, filename: str) -> list:
-        utils.verbose(f"Rebuilding image from bitmap and saving it to {filename}", 1)
+        utils.verbose("Rebuilding image from bitmap and saving it to %s", 1, filename)
         result = []
         for _ in range(len(bitmap) * self.translation_map[0].size):
             result.append([])
@@ -90,7 +97,7 @@ class ImageTranslator(object):
         
         img = Image.fromarray(np.asarray(result, dtype=np.uint8))
         img.save(filename)
-        utils.verbose(f"Successfully save rebuild image to {filename}", 1)
+        utils.verbose("Successfully save rebuild image to %s", 1, filename)
         return result
     
 
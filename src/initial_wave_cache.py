@@ -0,0 +1,56 @@
+#! /usr/bin/python3
+
+import weakref
+import collections
+
+import numpy as np
+
+import config
+
+class InitialWaveCache(object):
+    """
+    Starting waves with pins and unit nogoods already applied and propagated, per tile model and constraints.
+    A wave is stored as read-only boolean array (tiles, patterns), every attempt starts from a copy of it
+    instead of propagating the same constraints again. Entries of a model disappear together with the model
+    and are dropped when its rules are rebuilt, at most config.INITIAL_WAVE_CACHE_SIZE waves are kept per
+    model(least recently used are dropped first)
+    """
+    def __init__(self):
+        # tile model -> (compatibility the waves have been propagated with, OrderedDict key -> wave)
+        self._waves = weakref.WeakKeyDictionary()
+
+    def get(self, tile_model, key: tuple) -> np.ndarray:
+        """
+        Returns the cached wave for <key>, None when there is none
+        """
+        compatibility, waves = self._waves.get(tile_model, (None, None))
+        if compatibility is not tile_model.compatibility or key not in waves:
+            return None
+        waves.move_to_end(key)
+        return waves[key]
+
+    def put(self, tile_model, key: tuple, wave: np.ndarray) -> None:
+        if config.INITIAL_WAVE_CACHE_SIZE <= 0:
+            return
+        compatibility, waves = self._waves.get(tile_model, (None, None))
+        if compatibility is not tile_model.compatibility:
+            waves = collections.OrderedDict()
+            self._waves[tile_model] = (tile_model.compatibility, waves)
+        wave = wave.copy()
+        wave.flags.writeable = False
+        waves[key] = wave
+        while len(waves) > config.INITIAL_WAVE_CACHE_SIZE:
+            waves.popitem(last=False)
+
+    def clear(self) -> None:
+        self._waves.clear()
+
+
+def constraints_key(size: tuple, periodic: bool, mask: bytes, pins: dict, unit_nogoods: frozenset = frozenset()) -> tuple:
+    """
+    Key identifying a starting wave, <pins> maps tile indices to pattern indices
+    """
+    return (tuple(size), periodic, mask, tuple(sorted(pins.items())), unit_nogoods)
+
+# Shared by every engine, the reference and the dense engine store the same waves
+initial_waves = InitialWaveCache()
@@ -0,0 +1,58 @@
+#! /usr/bin/python3
+
+import json
+
+# Phases Stats measures the wall time of
+TRANSLATE = "translate"
+PATTERNS = "patterns"
+RULES = "rules"
+OBSERVE = "observe"
+PROPAGATE = "propagate"
+PHASES = (TRANSLATE, PATTERNS, RULES, OBSERVE, PROPAGATE)
+
+class Stats(object):
+    """
+    Where the time of a stage or a generation went. Always collected, counting costs an integer
+    increment per event and timing a few time.perf_counter() calls per step.
+    ImageTranslator and TileModel keep the stats of their last stage, GenerationResult those of its run
+        times:------------wall time in seconds per phase(see PHASES)
+        observations:-----tiles collapsed by choice
+        bans:-------------patterns removed from a tile
+        queue_pops:-------tiles taken from the propagation queue(reference engine only)
+        max_frontier:-----most tiles waiting in the propagation queue at once(reference engine only)
+        contradictions:---tiles that ran out of patterns, recovered ones included
+        restarts:---------attempts made after the first one
+    """
+    def __init__(self):
+        self.times = dict.fromkeys(PHASES, 0.0)
+        self.observations = 0
+        self.bans = 0
+        self.queue_pops = 0
+        self.max_frontier = 0
+        self.contradictions = 0
+        self.restarts = 0
+
+    def merge(self, other) -> None:
+        """
+        Add the times and counters of <other> to these
+        """
+        for phase, seconds in other.times.items():
+            self.times[phase] = self.times.get(phase, 0.0) + seconds
+        self.observations += other.observations
+        self.bans += other.bans
+        self.queue_pops += other.queue_pops
+        self.max_frontier = max(self.max_frontier, other.max_frontier)
+        self.contradictions += other.contradictions
+        self.restarts += other.restarts
+
+    def as_dict(self) -> dict:
+        return {key: dict(value) if key == "times" else value for key, value in vars(self).items()}
+
+    def to_json(self, **kwargs) -> str:
+        """
+        Returns the stats as JSON string, <kwargs> are passed on to json.dumps
+        """
+        return json.dumps(self.as_dict(), **kwargs)
+
+    def __repr__(self):
+        return f"Stats({', '.join(f'{key}={value!r}' for key, value in vars(self).items())})"
@@ -0,0 +1,55 @@
+#! /usr/bin/python3
+
+import collections
+
+class NogoodStore(object):
+    """
+    Bounded store of learned nogoods, small configurations of patterns that can never appear
+    together in an output because they leave the tile between them without any possible pattern.
+    A nogood is a frozenset of (row_offset, column_offset, pattern_index) relative to the tile
+    that ran out of patterns, which makes it independent of where it has been found.
+    When the store is full the least recently used nogood is dropped.
+    """
+    def __init__(self, capacity: int = 1000):
+        self.capacity = capacity
+        self._nogoods = collections.OrderedDict()
+        # pattern index -> nogoods containing the pattern
+        self._by_pattern = collections.defaultdict(set)
+
+    def add(self, nogood: frozenset) -> None:
+        if nogood in self._nogoods:
+            self._nogoods.move_to_end(nogood)
+            return
+        self._nogoods[nogood] = None
+        for _, _, pattern_index in nogood:
+            self._by_pattern[pattern_index].add(nogood)
+        if len(self._nogoods) > self.capacity:
+            self._remove(self._nogoods.popitem(last=False)[0])
+
+    def lookup(self, pattern_index: int) -> list:
+        """
+        Returns all nogoods containing the pattern with <pattern_index>
+        """
+        return list(self._by_pattern.get(pattern_index, ()))
+
+    def touch(self, nogood: frozenset) -> None:
+        """
+        Mark <nogood> as recently used
+        """
+        if nogood in self._nogoods:
+            self._nogoods.move_to_end(nogood)
+
+    def _remove(self, nogood: frozenset) -> None:
+        for _, _, pattern_index in nogood:
+            self._by_pattern[pattern_index].discard(nogood)
+            if not self._by_pattern[pattern_index]:
+                del self._by_pattern[pattern_index]
+
+    def __contains__(self, nogood: frozenset) -> bool:
+        return nogood in self._nogoods
+
+    def __iter__(self):
+        return iter(self._nogoods)
+
+    def __len__(self):
+        return len(self._nogoods)
@@ -0,0 +1,99 @@
+#! /usr/bin/python3
+
+import bisect
+import itertools
+import collections
+
+import numpy as np
+
+class AliasTable(object):
+    """
+    Walker/Vose alias table over a fixed list of options, allows drawing an option
+    proportional to its weight with a single random number in O(1)
+    """
+    def __init__(self, options: list, weights: list):
+        self.options = options
+        number_of_options = len(options)
+        total = sum(weights)
+        scaled = [weight * number_of_options / total for weight in weights]
+
+        self.probability = [1.0] * number_of_options
+        self.alias = list(range(number_of_options))
+        small = [index for index, value in enumerate(scaled) if value < 1]
+        large = [index for index, value in enumerate(scaled) if value >= 1]
+        while small and large:
+            lower, upper = small.pop(), large.pop()
+            self.probability[lower] = scaled[lower]
+            self.alias[lower] = upper
+            scaled[upper] += scaled[lower] - 1
+            (small if scaled[upper] < 1 else large).append(upper)
+
+    def draw(self, random_value: float):
+        """
+        random_value should be uniformly distributed in [0, 1)
+        """
+        column, remainder = divmod(random_value * len(self.options), 1)
+        column = int(column)
+        if remainder < self.probability[column]:
+            return self.options[column]
+        return self.options[self.alias[column]]
+
+
+class PatternSampler(object):
+    """
+    Draws one of the remaining patterns of a tile proportional to the pattern weights
+    found in the input, renormalized over the remaining patterns.
+    An option set seen for the first time is sampled by a cumulative weight search over
+    the compact list of remaining patterns, as soon as it shows up again an alias table
+    is built and cached(least recently used are dropped first) so repeated draws cost O(1)
+    """
+    def __init__(self, patterns: list, rng: np.random.Generator, cache_size: int = 1024):
+        self._weights = [0] * len(patterns)
+        for pattern in patterns:
+            self._weights[pattern.index] = pattern.weight
+        self.rng = rng
+        self._cache_size = cache_size
+        # (option indices, maximum_only) -> None when seen once, AliasTable afterwards
+        self._tables = collections.OrderedDict()
+
+    def reset(self, rng: np.random.Generator) -> None:
+        """
+        Draw from <rng> from now on and forget the cached tables, which tables exist decides how
+        random numbers map to patterns, so only a fresh sampler reproduces the draws of a seed
+        """
+        self.rng = rng
+        self._tables.clear()
+
+    def sample(self, options: list, maximum_only: bool = False):
+        """
+        Returns one of <options>, when maximum_only is set only the options with the
+        highest weight are considered
+        """
+        if len(options) == 1:
+            return options[0]
+
+        key = (tuple(pattern.index for pattern in options), maximum_only)
+        if key in self._tables:
+            table = self._tables[key]
+            self._tables.move_to_end(key)
+            if table is None:
+                table = self._tables[key] = self._build_table(options, maximum_only)
+            return table.draw(self.rng.random())
+
+        self._tables[key] = None
+        if len(self._tables) > self._cache_size:
+            self._tables.popitem(last=False)
+
+        if maximum_only:
+            options = self._maximum_weight_options(options)
+        cumulative_weights = list(itertools.accumulate(self._weights[pattern.index] for pattern in options))
+        return options[bisect.bisect_right(cumulative_weights, self.rng.random() * cumulative_weights[-1])]
+
+    def _maximum_weight_options(self, options: list) -> list:
+        maximum_weight = max(self._weights[pattern.index] for pattern in options)
+        return [pattern for pattern in options if self._weights[pattern.index] >= maximum_weight]
+
+    def _build_table(self, options: list, maximum_only: bool) -> AliasTable:
+        if maximum_only:
+            options = self._maximum_weight_options(options)
+        return AliasTable(list(options), [self._weights[pattern.index] for pattern in options])
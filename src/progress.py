@@ -0,0 +1,69 @@
+#! /usr/bin/python3
+
+import sys
+
+import config
+
+def progressbar(progress, maximum, text_front='', text_back='', filler_main='#', filler_back='-', bar_lenght=50):
+    '''
+    *args
+        progress:---current value of process
+        maximum:----max value process can reach
+    **kwargs
+        text_front:-text in front of the progressbar (TEXT_FRONT[####     ])
+        text_back:--text behind the progressbar ([###     ]TEXT_BACK)
+        filler_main:-----char used in the progressbar ([####     ], [++++    ], [====    ], ...)
+        filler_back:-----char used as background-filler ([###-----], [###     ], ([###.....]), ...)
+        bar_lenght:-lenght of progressbar ([   <-"space between square brackets"->   ])
+    '''
+    percentage = round((progress / maximum) * bar_lenght)
+    inside = f"{percentage*filler_main}{(bar_lenght - percentage) * filler_back}"
+    output = "\r{}[{:{}s}]{}".format(text_front, inside, bar_lenght, text_back)
+    if progress >= maximum:
+        output = "\r{}[{:{}s}]{}\n".format(text_front, bar_lenght*filler_main, bar_lenght, text_back)
+    sys.stdout.write(output)
+    sys.stdout.flush()
+
+def console_progress(collapsed_tiles: int, number_of_tiles: int, elapsed: float) -> None:
+    """
+    Progress callback drawing the progressbar on the console
+    """
+    progressbar(collapsed_tiles, number_of_tiles, bar_lenght=100, text_back=f" {elapsed:.2f} sec")
+
+
+class ThrottledProgress(object):
+    """
+    Forwards progress reports callback(collapsed_tiles, number_of_tiles, elapsed seconds) to <callback>,
+    but only when <interval> seconds have passed or <percentage> percent of the tiles have been collapsed
+    since the last forwarded report. The first report, every report of a completed output and every
+    report after the output has been reset are always forwarded. A limit set to None is not used
+    """
+    def __init__(self, callback, interval: float = None, percentage: float = None):
+        self.callback = callback
+        self.interval = config.PROGRESS_INTERVAL if interval is None and percentage is None else interval
+        self.percentage = percentage
+        self._last_count = None
+        self._next_count = 0
+        self._next_time = 0.0
+
+    def __call__(self, collapsed_tiles: int, number_of_tiles: int, elapsed: float) -> None:
+        due = (self._last_count is None or collapsed_tiles < self._last_count or collapsed_tiles >= number_of_tiles
+               or collapsed_tiles >= self._next_count or elapsed >= self._next_time)
+        if not due:
+            return
+        self._last_count = collapsed_tiles
+        self._next_count = collapsed_tiles + number_of_tiles * self.percentage / 100 if self.percentage is not None else number_of_tiles
+        self._next_time = elapsed + self.interval if self.interval is not None else float("inf")
+        self.callback(collapsed_tiles, number_of_tiles, elapsed)
+
+
+def reporter(callback) -> ThrottledProgress:
+    """
+    Returns <callback> throttled(as is when it is a ThrottledProgress already), without a callback the
+    console progressbar when config.DEBUG_LEVEL >= 1, None otherwise
+    """
+    if callback is None:
+        return ThrottledProgress(console_progress) if config.DEBUG_LEVEL >= 1 else None
+    if isinstance(callback, ThrottledProgress):
+        return callback
+    return ThrottledProgress(callback)
@@ -0,0 +1,73 @@
+#! /usr/bin/python3
+
+FIFO = "FIFO"
+LIFO = "LIFO"
+
+class PropagationQueue(object):
+    """
+    Work queue of flat tile indices (row_index * number_of_columns + column_index) used
+    while propagating. A bitmap over the whole map remembers which tiles are currently
+    enqueued, so pushing an already waiting tile is a no-op and checking it costs O(1).
+    As every tile can be waiting at most once, the preallocated ring buffer never needs
+    more than <capacity> slots.
+    order decides which tile is popped next
+        FIFO -> breadth first, oldest tile first
+        LIFO -> depth first, newest tile first
+    """
+    def __init__(self, capacity: int, order: str = LIFO):
+        if order not in (FIFO, LIFO):
+            raise ValueError(f"order must be either {FIFO} or {LIFO}, got {order}")
+        self.order = order
+        self.capacity = capacity
+        self._buffer = [0] * capacity
+        self._enqueued = bytearray(capacity)
+        self._head = 0
+        self._size = 0
+        # Most tiles that have been waiting at once
+        self.peak = 0
+
+    def push(self, index: int) -> bool:
+        """
+        Enqueue the tile at <index>, returns False when it is already waiting
+        """
+        if self._enqueued[index]:
+            return False
+        self._enqueued[index] = 1
+        self._buffer[(self._head + self._size) % self.capacity] = index
+        self._size += 1
+        if self._size > self.peak:
+            self.peak = self._size
+        return True
+
+    def pop(self) -> int:
+        """
+        Remove and return the next tile index depending on the queue order
+        """
+        if self._size == 0:
+            raise IndexError("pop from empty PropagationQueue")
+        self._size -= 1
+        if self.order == FIFO:
+            index = self._buffer[self._head]
+            self._head = (self._head + 1) % self.capacity
+        else:
+            index = self._buffer[(self._head + self._size) % self.capacity]
+        self._enqueued[index] = 0
+        return index
+
+    def clear(self) -> None:
+        """
+        Drop every waiting tile, only touches the entries that are actually enqueued
+        """
+        for offset in range(self._size):
+            self._enqueued[self._buffer[(self._head + offset) % self.capacity]] = 0
+        self._head = 0
+        self._size = 0
+
+    def __contains__(self, index: int) -> bool:
+        return self._enqueued[index] == 1
+
+    def __len__(self):
+        return self._size
+
+    def __bool__(self):
+        return self._size > 0
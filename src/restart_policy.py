@@ -0,0 +1,98 @@
+#! /usr/bin/python3
+
+import time
+
+import config
+
+class RestartPolicy(object):
+    """
+    Decides how many attempts generate_map makes and how many contradictions every attempt
+    may recover from(by backtracking or repairing) before it is given up.
+    attempts() yields one budget per attempt, None means the limits from config.py apply.
+    With the "restart" contradiction strategy every contradiction ends the attempt anyway
+    and only the number of attempts matters.
+    """
+    def attempts(self):
+        raise NotImplementedError()
+
+    def expired(self) -> bool:
+        """
+        Returns True when the running attempt has to be stopped
+        """
+        return False
+
+
+class FixedRestarts(RestartPolicy):
+    """
+    Up to <max_tries> attempts, each with the same budget
+    """
+    def __init__(self, max_tries: int = None, budget: int = None):
+        self.max_tries = config.MAX_TRIES if max_tries is None else max_tries
+        self.budget = budget
+
+    def attempts(self):
+        for _ in range(self.max_tries):
+            yield self.budget
+
+
+class GeometricRestarts(RestartPolicy):
+    """
+    Up to <max_tries> attempts, the budget starts at <initial_budget> and is multiplied
+    by <factor> after every failed attempt
+    """
+    def __init__(self, initial_budget: int = 16, factor: float = 2.0, max_tries: int = None):
+        self.initial_budget = initial_budget
+        self.factor = factor
+        self.max_tries = config.MAX_TRIES if max_tries is None else max_tries
+
+    def attempts(self):
+        budget = self.initial_budget
+        for _ in range(self.max_tries):
+            yield int(budget)
+            budget *= self.factor
+
+
+def luby(index: int) -> int:
+    """
+    Returns the <index>th(starting at 1) element of the luby sequence 1, 1, 2, 1, 1, 2, 4, 1, 1, 2, ...
+    """
+    power = 1
+    while (1 << power) - 1 < index:
+        power += 1
+    if (1 << power) - 1 == index:
+        return 1 << (power - 1)
+    return luby(index - (1 << (power - 1)) + 1)
+
+
+class LubyRestarts(RestartPolicy):
+    """
+    Up to <max_tries> attempts with budgets following the luby sequence scaled by <unit>,
+    which is within a logarithmic factor of the optimal restart strategy when nothing
+    about the runtime distribution is known
+    """
+    def __init__(self, unit: int = 16, max_tries: int = None):
+        self.unit = unit
+        self.max_tries = config.MAX_TRIES if max_tries is None else max_tries
+
+    def attempts(self):
+        for index in range(1, self.max_tries + 1):
+            yield self.unit * luby(index)
+
+
+class TimeBudgetRestarts(RestartPolicy):
+    """
+    Keeps on making attempts with the same budget until <seconds> have passed in total,
+    an attempt still running at that point is stopped
+    """
+    def __init__(self, seconds: float, budget: int = None):
+        self.seconds = seconds
+        self.budget = budget
+        self._deadline = None
+
+    def attempts(self):
+        self._deadline = time.monotonic() + self.seconds
+        while time.monotonic() < self._deadline:
+            yield self.budget
+
+    def expired(self) -> bool:
+        return self._deadline is not None and time.monotonic() >= self._deadline
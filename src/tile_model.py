@@ -1,8 +1,13 @@
 #! /usr/bin/python3
 
+import os
+import time
+import json
+import pickle
 
 import image_translator
 import directions
+import instrumentation
 import utils
 
 from config import *
@@ -19,7 +24,6 @@ class Pattern(object):
         self.weight = 1
         self.width = len(pixels[0])
         self.height = len(pixels)
-        self.collapsed = False
 
     def set_probability(self, probability: float):
         self.probability = probability
@@ -64,12 +68,52 @@ class TileModel(object):
         self._translated_image = translated_image
         self.patterns = []
         self.rules = {}
+        self.compatibility = []
+        # Nogoods learned while generating outputs from this model, see nogood_store.py
+        self.nogoods = None
+        # "<height>x<width>" -> config settings found by autotuner.tune for outputs of that size
+        self.tuning = {}
+        # File the model has been saved to or loaded from, the tuning is stored next to it
+        self.filename = None
+        # instrumentation.Stats of building patterns and rules, not saved with the model
+        self.stats = instrumentation.Stats()
 
-    def load(self):
-        raise NotImplementedError()
+    def load(self, filename: str) -> None:
+        """
+        Load a model saved by save() from <filename> together with the tuning stored next to it
+        """
+        utils.verbose("Loading tile model from %s", 1, filename)
+        with open(filename, "rb") as file:
+            self.__dict__.update(pickle.load(file))
+        self.filename = filename
+        self.tuning = {}
+        if os.path.exists(tuning_filename(filename)):
+            with open(tuning_filename(filename)) as file:
+                self.tuning = json.load(file)
 
-    def save(self):
-        raise NotImplementedError()
+    def save(self, filename: str = None) -> None:
+        """
+        Save patterns, rules and learned nogoods to <filename>(the file the model has been loaded from by default),
+        the tuning is written to a json file next to it
+        """
+        filename = filename or self.filename
+        if filename is None:
+            raise ValueError("No filename to save the tile model to")
+        utils.verbose("Saving tile model to %s", 1, filename)
+        state = {key: value for key, value in self.__dict__.items() if key not in ("tuning", "filename", "stats")}
+        with open(filename, "wb") as file:
+            pickle.dump(state, file)
+        self.filename = filename
+        self.save_tuning()
+
+    def save_tuning(self) -> None:
+        """
+        Write the tuning next to the saved model, nothing happens for a model that has never been saved
+        """
+        if self.filename is None:
+            return
+        with open(tuning_filename(self.filename), "w") as file:
+            json.dump(self.tuning, file, indent=4, sort_keys=True)
 
     def _get_pattern(self, pos: tuple, size: int) -> Pattern:
         """
@@ -103,7 +147,8 @@ class TileModel(object):
         them 90/180 and 270 degrees when option ROTATE is enabled
         Save the corresponding occurance probabilties to as soon as all distinct patterns have been found
         """
-        utils.verbose(f"Breakdown bitmap into {pattern_size}-sized patterns", 1)
+        utils.verbose("Breakdown bitmap into %s-sized patterns", 1, pattern_size)
+        start = time.perf_counter()
         if pattern_size[0] <= 1 or pattern_size[1] <= 1:
             raise ValueError(f"pattern_size must be at least 2x2, got {pattern_size[0]}x{pattern_size[1]}")
         image_map = self._translated_image.translated_image
@@ -123,7 +168,8 @@ class TileModel(object):
             pattern.set_probability(pattern.weight / weights)
             pattern.index = index
             Pattern.index = index
-        utils.verbose(f"Brokedown bitmap into {Pattern.index + 1} patterns of size {pattern_size}", 1)
+        self.stats.times[instrumentation.PATTERNS] = time.perf_counter() - start
+        utils.verbose("Brokedown bitmap into %d patterns of size %s", 1, Pattern.index + 1, pattern_size)
 
     def build_rules(self) -> None:
         """
@@ -134,7 +180,9 @@ class TileModel(object):
             pattern -> dict
                 direction -> corresponding pattern indicies
         """
+        start = time.perf_counter()
         self.rules = {} 
+        self.nogoods = None
         for pattern in self.patterns:
             self.rules[pattern] = {}
             for direction in directions.Directions:
@@ -142,22 +190,66 @@ class TileModel(object):
                 for questioned_pattern in self.patterns:
                     if pattern.overlaps(questioned_pattern, direction):
                         self.rules[pattern][direction].append(questioned_pattern)
-        utils.verbose(f"Build {len(self)} rules", 1) 
+        self._build_compatibility()
+        self.stats.times[instrumentation.RULES] = time.perf_counter() - start
+        utils.verbose("Build %d rules", 1, len(self)) 
+
+    def _build_compatibility(self) -> None:
+        """
+        Compile the rules into a pure integer form used during propagation
+        compatibility: list
+            direction index(order of directions.Directions) -> list
+                pattern index -> bitmask of the pattern indices allowed on the adjacent tile in that direction
+        """
+        direction_list = list(directions.Directions)
+        self.compatibility = [[0] * len(self.patterns) for _ in direction_list]
+        for adjacent_pattern in self.patterns:
+            for direction_index, direction in enumerate(direction_list):
+                for pattern in self.rules[adjacent_pattern][direction.negate()]:
+                    self.compatibility[direction_index][pattern.index] |= 1 << adjacent_pattern.index
     
     def reverse_patterns(self, bitmap: list) -> list:
         result = []
-        for _ in range(len(bitmap) * bitmap[0][0][0].height): 
+        for _ in range(len(bitmap) * self.patterns[0].height): 
             result.append([])
-            for _ in range(len(bitmap[0]) * bitmap[0][0][0].width):
+            for _ in range(len(bitmap[0]) * self.patterns[0].width):
                 result[-1].append([])
         
         for bitmap_row_index, bitmap_row in enumerate(bitmap):
             for bitmap_col_index, pattern in enumerate(bitmap_row):
+                # Tiles outside of the output mask have no pattern and are left empty
+                if not pattern:
+                    continue
                 for pattern_row_index, pattern_row in enumerate(pattern[0].pixels):
                     for pattern_col_index, pixel in enumerate(pattern_row):
-                        result[bitmap_row_index * bitmap[0][0][0].height + pattern_row_index][bitmap_col_index * bitmap[0][0][0].width + pattern_col_index] = pixel
+                        result[bitmap_row_index * self.patterns[0].height + pattern_row_index][bitmap_col_index * self.patterns[0].width + pattern_col_index] = pixel
         return result    
 
+    def to_indices(self, bitmap: list) -> list:
+        """
+        Compact form of a collapsed bitmap(2-dimensional list of pattern lists) containing
+        only the pattern indices, tiles without a pattern become -1
+        """
+        return [[patterns[0].index if len(patterns) == 1 else -1 for patterns in row] for row in bitmap]
+
+    def from_indices(self, indices: list) -> list:
+        """
+        Reverse of to_indices, builds a bitmap of pattern lists from pattern indices
+        """
+        return [[[self.patterns[index]] if index >= 0 else [] for index in row] for row in indices]
+
+    def to_index_lists(self, bitmap: list) -> list:
+        """
+        Compact form of a partially collapsed bitmap containing the indices of all possible patterns per tile
+        """
+        return [[[pattern.index for pattern in patterns] for patterns in row] for row in bitmap]
+
+    def from_index_lists(self, index_lists: list) -> list:
+        """
+        Reverse of to_index_lists, builds a bitmap of pattern lists from lists of pattern indices
+        """
+        return [[[self.patterns[index] for index in indices] for indices in row] for row in index_lists]
+
 
     def __str__(self):
         result = "Patterns\n"
@@ -174,6 +266,14 @@ class TileModel(object):
     def __len__(self):
         return sum([len(self.rules[pattern][direction]) for pattern in self.rules for direction in self.rules[pattern]])
 
+
+def tuning_filename(filename: str) -> str:
+    """
+    Returns the name of the tuning file stored next to the model saved at <filename>
+    """
+    return f"{os.path.splitext(filename)[0]}.tuning.json"
+
+
 if __name__ == "__main__":
     it = image_translator.ImageTranslator()
     it.breakdown_image("../resources/images/streets32x32.png", 8)
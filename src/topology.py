@@ -0,0 +1,80 @@
+#! /usr/bin/python3
+
+import directions
+
+class Topology(object):
+    """
+    Static layout of an output map, built once per output size so propagation only has to do
+    integer lookups instead of checking bounds and building coordinates for every visit.
+    Tiles are addressed by their flat index (row_index * number_of_columns + column_index).
+
+    neighbors[direction_index][tile_index]
+        flat index of the adjacent tile in that direction, -1 when it lies outside of the map
+        or outside of the mask
+    opposite[direction_index]
+        index of the direction pointing in the exact opposite direction
+    periodic
+        when True the map wraps around, tiles on the edges are adjacent to the opposite edge
+    mask
+        optional 2-dimensional list (row, column) of booleans, only tiles set to True are part
+        of the output, which allows non rectangular output regions
+    """
+    def __init__(self, size: tuple, periodic: bool = False, mask: list = None):
+        self.size = tuple(size)
+        self.height, self.width = self.size
+        self.periodic = periodic
+        self.number_of_tiles = self.height * self.width
+
+        self.directions = list(directions.Directions)
+        self.opposite = [self.directions.index(direction.negate()) for direction in self.directions]
+
+        self.mask = None
+        if mask is not None:
+            if len(mask) != self.height or any(len(row) != self.width for row in mask):
+                raise ValueError(f"mask must be of size {self.height}x{self.width}")
+            self.mask = bytearray(1 if value else 0 for row in mask for value in row)
+
+        self.active_tiles = [index for index in range(self.number_of_tiles) if self.is_active(index)]
+        self.neighbors = [self._build_neighbors(direction) for direction in self.directions]
+
+    @property
+    def number_of_active_tiles(self) -> int:
+        return len(self.active_tiles)
+
+    def is_active(self, index: int) -> bool:
+        """
+        Returns True when the tile at <index> is part of the output
+        """
+        return self.mask is None or self.mask[index] == 1
+
+    def index(self, pos: tuple) -> int:
+        return pos[0] * self.width + pos[1]
+
+    def position(self, index: int) -> tuple:
+        return divmod(index, self.width)
+
+    def matches(self, size: tuple, periodic: bool, mask: list) -> bool:
+        """
+        Returns True when this topology describes an output with the given properties
+        and can therefore be reused
+        """
+        if self.size != tuple(size) or self.periodic != periodic:
+            return False
+        if mask is None or self.mask is None:
+            return mask is None and self.mask is None
+        return self.mask == bytearray(1 if value else 0 for row in mask for value in row)
+
+    def _build_neighbors(self, direction: directions.Directions) -> list:
+        neighbors = [-1] * self.number_of_tiles
+        for index in self.active_tiles:
+            row = index // self.width + direction.value[0]
+            col = index % self.width + direction.value[1]
+            if self.periodic:
+                row %= self.height
+                col %= self.width
+            elif not (0 <= row < self.height and 0 <= col < self.width):
+                continue
+            adjacent = row * self.width + col
+            if self.is_active(adjacent):
+                neighbors[index] = adjacent
+        return neighbors
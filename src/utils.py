@@ -2,13 +2,36 @@
 
 import config
 
+import sys
 import time
+import logging
 
-def verbose(message: str, level: int) -> None:
-    if 0 <= level <= config.DEBUG_LEVEL:
-        print(f"{timestring()} {message}")
-    elif level < 0 or level > 3:
+# Logging level of every verbose level, level 3 lies below logging.DEBUG
+TRACE = 5
+LEVELS = {0: logging.WARNING, 1: logging.INFO, 2: logging.DEBUG, 3: TRACE}
+logging.addLevelName(TRACE, "TRACE")
+
+# config.DEBUG_LEVEL decides what is logged, the logger itself lets everything pass
+logger = logging.getLogger("wave_function_collapse")
+logger.setLevel(TRACE)
+if config.LOG_TO_CONSOLE:
+    _handler = logging.StreamHandler(sys.stdout)
+    _formatter = logging.Formatter("%(asctime)s %(message)s", "[%H:%M:%S]")
+    _formatter.converter = time.gmtime
+    _handler.setFormatter(_formatter)
+    logger.addHandler(_handler)
+    logger.propagate = False
+
+def verbose(message: str, level: int, *args) -> None:
+    """
+    Log <message> when <level> <= config.DEBUG_LEVEL. The message is formatted with <args>(%-style)
+    only when it is logged, so pass values as args instead of building the message up front.
+    Callers in hot paths check config.DEBUG_LEVEL themselves before computing the args
+    """
+    if level < 0 or level > 3:
         raise ValueError(f"{level} is out of range [0, 3]")
+    if level <= config.DEBUG_LEVEL:
+        logger.log(LEVELS[level], message, *args)
 
 def timestring() -> str:
     return time.strftime('[%H:%M:%S]', time.gmtime())
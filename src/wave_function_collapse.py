@@ -2,247 +2,1256 @@
 
 # @author Lukas Grünwald
 
-import sys
+import os
 import math
 import time
-import random
+import asyncio
+import threading
+import functools
+import bisect
+import operator
+import multiprocessing
+import concurrent.futures
+
+import numpy as np
 
 import image_translator
 import tile_model
-import directions
+import propagation_queue
+import topology
+import pattern_sampler
+import nogood_store
+import restart_policy as restart_policy_module
+import dense_wave
+import engine_backend
+import autotuner
+import initial_wave_cache
+import generation_result
+import progress as progress_module
+import instrumentation
 import config
 import utils
 
-def progressbar(progress, maximum, text_front='', text_back='', filler_main='#', filler_back='-', bar_lenght=50):
-    '''
-    *args
-        progress:---current value of process
-        maximum:----max value process can reach
-    **kwargs
-        text_front:-text in front of the progressbar (TEXT_FRONT[####     ])
-        text_back:--text behind the progressbar ([###     ]TEXT_BACK)
-        filler_main:-----char used in the progressbar ([####     ], [++++    ], [====    ], ...)
-        filler_back:-----char used as background-filler ([###-----], [###     ], ([###.....]), ...)
-        bar_lenght:-lenght of progressbar ([   <-"space between square brackets"->   ])
-    '''
-    percentage = round((progress / maximum) * bar_lenght)
-    inside = f"{percentage*filler_main}{(bar_lenght - percentage) * filler_back}"
-    output = "\r{}[{:{}s}]{}".format(text_front, inside, bar_lenght, text_back)
-    if progress >= maximum:
-        output = "\r{}[{:{}s}]{}\n".format(text_front, bar_lenght*filler_main, bar_lenght, text_back)
-    sys.stdout.write(output)
-    sys.stdout.flush()
+# Strategies to recover from a contradiction, see config.CONTRADICTION_STRATEGY
+RESTART = "restart"
+BACKTRACK = "backtrack"
+REPAIR = "repair"
+
+# Propagation modes, see config.PROPAGATION_MODE
+QUEUE = "queue"
+SWEEP = "sweep"
+AUTO = "auto"
+
+# Kept for scripts importing it from here
+progressbar = progress_module.progressbar
 
 
 class UnsolvableException(Exception):
     def __init__(self, msg=""):
         if msg != "":
             msg = f"{msg}. "
-        super().__init__("{msg}At least one tile exists that has no matching pattern")
+        super().__init__(f"{msg}At least one tile exists that has no matching pattern")
 
 class NotInitializedException(Exception):
     def __init__(self, msg="unknown"):
         super().__init__(f"Has not been initialized - <{msg}>")
 
+class StoppedException(Exception):
+    def __init__(self, msg="Stopped", status=generation_result.STOPPED):
+        super().__init__(msg)
+        # generation_result status the generation ends with
+        self.status = status
+
 
 
 class WaveFunctionCollapse(object):
-    def __init__(self, tile_model: tile_model.TileModel):
+    def __init__(self, tile_model: tile_model.TileModel, seed=None, restart_policy: restart_policy_module.RestartPolicy = None,
+                 engine: str = None):
+        """
+        seed
+            integer seed or numpy.random.Generator all random decisions are drawn from,
+            the same seed reproduces the same output
+        restart_policy
+            decides how many attempts generate_map makes, defaults to config.MAX_TRIES attempts
+        engine
+            backend generate_map runs on, see config.ENGINE which is used by default
+        """
         self._tile_model = tile_model
-        self._output = None
+        self.restart_policy = restart_policy
+        self.engine = engine
+        # Set when generation should stop as soon as possible, shared with other processes in a pool
+        self._stop_event = None
+        # Limits of the running generate_map call, time.monotonic() deadline and observe steps over all attempts
+        self._deadline = None
+        self._max_steps = None
+        # Throttled progress callback of the running generate_map call, see progress.reporter
+        self._progress = None
+        # Times and counters of the running generation, attached to its GenerationResult
+        self._stats = instrumentation.Stats()
+        # Settings of the running generation, the config.py values unless autotuner.tune found
+        # others for its size, see _prepare
+        self._tuned_settings = {}
+        self._propagation_order = config.PROPAGATION_ORDER
+        self._propagation_mode = config.PROPAGATION_MODE
+        self._seed = seed
+        self._rng = np.random.default_rng(seed)
+        self._sampler = pattern_sampler.PatternSampler(tile_model.patterns, self._rng, config.SAMPLER_CACHE_SIZE)
+        # Flat list of the possible patterns per tile, indexed like the topology
+        self._wave = None
+        self._topology = None
+
+        # Running counters, kept up to date by _ban() so checking for completion
+        # or contradictions never has to walk the whole map
+        self._number_of_tiles = 0
+        self._collapsed_count = 0
+        self._contradiction_count = 0
+        self._observations = 0
+
+        self._queue = None
+        # Dense adjacency tensor and active tiles for sweep propagation, built on first use
+        self._adjacency = None
+        self._active = None
+
+        # Every ban since the last initialization in chronological order as (index, pattern), only
+        # recorded while backtracking, together with the decision points as (trail length, index, pattern)
+        self._trail = None
+        self._decisions = []
+        self._backtracks = 0
+
+        # Contradictions the running attempt may still recover from, None for the config.py limits
+        self._budget = None
+
+        # Index of the tile that ran out of patterns last and state of the block repair
+        self._contradiction_index = None
+        self._repairs = 0
+        self._repair_block_size = 0
+        self._repaired_block = set()
+
+        # Learned nogoods are shared by every generator using the same tile model
+        self._nogoods = None
+        self._pending_singletons = []
+        # Index of a tile -> index of the only pattern the tile may take, set by generate_map
+        self._pins = {}
+
+        # Step-wise generation, see iter_generate. Indices of the tiles changed since the last step
+        # are only collected while a step-wise generation is running
+        self._stepper = None
+        self._changed = None
+        self._observed_index = None
+        self.last_result = None
+        if config.LEARN_NOGOODS:
+            if tile_model.nogoods is None:
+                tile_model.nogoods = nogood_store.NogoodStore(config.NOGOOD_CAPACITY)
+            self._nogoods = tile_model.nogoods
+
+    def reseed(self, seed) -> None:
+        """
+        Restart the random generator from <seed>, the next generate_map call produces the same output
+        as a new instance created with that seed
+        """
+        self._seed = seed
+        self._rng = np.random.default_rng(seed)
+        self._sampler.reset(self._rng)
 
     @property
     def output(self) -> list:
-        if self._output is None:
+        """
+        Possible patterns per tile as 2-dimensional list (row, column)
+        """
+        if self._wave is None:
             raise NotInitializedException("output")
-        return self._output
+        width = self._topology.width
+        return [self._wave[row * width:(row + 1) * width] for row in range(self._topology.height)]
 
     @property
     def number_of_collapsed_tiles(self):
-        s = 0
-        for row in self.output:
-            for cell in row:
-                if len(cell) == 1:
-                    s += 1
-        return s
+        return self._collapsed_count
+
+    @property
+    def number_of_observations(self):
+        """
+        Number of tiles that had to be collapsed by choice since the output was initialized,
+        tiles forced to a single pattern by propagation are not counted
+        """
+        return self._observations
+
+    @property
+    def number_of_backtracks(self):
+        """
+        Number of decisions that have been undone since the output was initialized
+        """
+        return self._backtracks
+
+    @property
+    def number_of_repairs(self):
+        """
+        Number of blocks that have been reset since the output was initialized
+        """
+        return self._repairs
 
 
     def _is_fully_collapsed(self) -> bool:
         """
         Returns true when the algorithm finished and produced a valid output
         """
-        utils.verbose(f"Checking if the map has completly collapsed", 3)
-        for column in self.output:
-            for tile in column:
-                if len(tile) > 1:
-                    return False
-                elif len(tile) == 0:
-                    raise UnsolvableException()
-        return True
+        if config.DEBUG_LEVEL >= 3:
+            utils.verbose("Checking if the map has completly collapsed", 3)
+        if self._contradiction_count > 0:
+            raise UnsolvableException()
+        return self._collapsed_count == self._number_of_tiles
+
+    def _ban(self, index: int, pattern) -> None:
+        """
+        Remove <pattern> from the possible patterns of the tile at <index> and keep the collapsed/contradiction
+        counters up to date. Raises UnsolvableException as soon as the tile runs out of patterns
+        """
+        patterns = self._wave[index]
+        patterns.remove(pattern)
+        self._stats.bans += 1
+        if self._changed is not None:
+            self._changed.add(index)
+        if self._trail is not None:
+            self._trail.append((index, pattern))
+        remaining = len(patterns)
+        if remaining == 1:
+            self._collapsed_count += 1
+            if self._nogoods is not None:
+                self._pending_singletons.append(index)
+        elif remaining == 0:
+            self._collapsed_count -= 1
+            self._contradiction_count += 1
+            self._stats.contradictions += 1
+            self._contradiction_index = index
+            if self._nogoods is not None:
+                self._learn_nogood(index)
+            raise UnsolvableException(f"No possible patterns at {self._topology.position(index)}")
+
+    def _offset_index(self, row: int, col: int):
+        """
+        Returns the index of the active tile at (row, col) wrapping around for periodic
+        outputs, None when there is no such tile
+        """
+        topology = self._topology
+        if topology.periodic:
+            row, col = row % topology.height, col % topology.width
+        elif not (0 <= row < topology.height and 0 <= col < topology.width):
+            return None
+        index = row * topology.width + col
+        return index if topology.is_active(index) else None
+
+    def _window_exists(self, row: int, col: int) -> bool:
+        """
+        Returns True when every tile within config.NOGOOD_RADIUS around (row, col) is part of the output.
+        Nogoods are only checked and applied where their whole window exists, tiles missing at the
+        edges would remove constraints the nogood relies on
+        """
+        radius = config.NOGOOD_RADIUS
+        topology = self._topology
+        if topology.periodic:
+            if topology.height <= 2 * radius or topology.width <= 2 * radius:
+                return False
+        elif not (radius <= row < topology.height - radius and radius <= col < topology.width - radius):
+            return False
+        if topology.mask is None:
+            return True
+        return all(self._offset_index(row + row_offset, col + col_offset) is not None
+                   for row_offset in range(-radius, radius + 1) for col_offset in range(-radius, radius + 1))
 
+    def _conflicts(self, members: list) -> bool:
+        """
+        Propagate <members>, (row_offset, column_offset, pattern_index) relative to the center, through
+        an otherwise open window of config.NOGOOD_RADIUS around the center.
+        Returns True when a tile inside the window runs out of patterns, which means the members can
+        never appear together wherever the window fits into an output
+        """
+        radius = config.NOGOOD_RADIUS
+        compatibility = self._tile_model.compatibility
+        offsets = [direction.value for direction in self._topology.directions]
+        full = (1 << len(self._tile_model.patterns)) - 1
+        domains = {(row_offset, col_offset): full for row_offset in range(-radius, radius + 1) for col_offset in range(-radius, radius + 1)}
+        stack = []
+        for row_offset, col_offset, pattern_index in members:
+            domains[(row_offset, col_offset)] = 1 << pattern_index
+            stack.append((row_offset, col_offset))
+        while stack:
+            key = stack.pop()
+            for direction_index, (row_offset, col_offset) in enumerate(offsets):
+                adjacent_key = (key[0] + row_offset, key[1] + col_offset)
+                if adjacent_key not in domains:
+                    continue
+                allowed = 0
+                remaining = domains[key]
+                while remaining:
+                    lowest = remaining & -remaining
+                    allowed |= compatibility[direction_index][lowest.bit_length() - 1]
+                    remaining ^= lowest
+                narrowed = domains[adjacent_key] & allowed
+                if narrowed != domains[adjacent_key]:
+                    if narrowed == 0:
+                        return True
+                    domains[adjacent_key] = narrowed
+                    stack.append(adjacent_key)
+        return False
+
+    def _learn_nogood(self, index: int) -> None:
+        """
+        The tile at <index> just ran out of patterns. When the collapsed tiles within config.NOGOOD_RADIUS
+        around it already cause a contradiction on their own they are reduced to as few tiles as possible,
+        farthest first, and remembered as nogood relative to the tile
+        """
+        row, col = self._topology.position(index)
+        if not self._window_exists(row, col):
+            return
+        radius = config.NOGOOD_RADIUS
+        members = []
+        for row_offset in range(-radius, radius + 1):
+            for col_offset in range(-radius, radius + 1):
+                options = self._wave[self._offset_index(row + row_offset, col + col_offset)]
+                if len(options) == 1:
+                    members.append((row_offset, col_offset, options[0].index))
+        if not members or not self._conflicts(members):
+            return
+
+        members.sort(key=lambda member: max(abs(member[0]), abs(member[1])), reverse=True)
+        for member in list(members):
+            reduced = [other for other in members if other != member]
+            if reduced and self._conflicts(reduced):
+                members = reduced
+        if len(members) > config.NOGOOD_MAX_SIZE:
+            return
+        nogood = frozenset(members)
+        utils.verbose("Learned nogood %s", 3, sorted(nogood))
+        self._nogoods.add(nogood)
+
+    def _apply_nogoods(self, index: int) -> None:
+        """
+        The tile at <index> just collapsed, for every learned nogood it completes except for a single
+        pattern that is still possible somewhere, ban that pattern before it can be chosen
+        """
+        if len(self._wave[index]) != 1:
+            return
+        wave = self._wave
+        row, col = self._topology.position(index)
+        pattern_index = wave[index][0].index
+        for nogood in self._nogoods.lookup(pattern_index):
+            for row_offset, col_offset, member_pattern in nogood:
+                if member_pattern != pattern_index:
+                    continue
+                anchor_row, anchor_col = row - row_offset, col - col_offset
+                if not self._window_exists(anchor_row, anchor_col):
+                    continue
+
+                open_member = None
+                for other_row_offset, other_col_offset, other_pattern in nogood:
+                    other_index = self._offset_index(anchor_row + other_row_offset, anchor_col + other_col_offset)
+                    if other_index is None:
+                        break
+                    options = wave[other_index]
+                    if len(options) == 1 and options[0].index == other_pattern:
+                        continue
+                    if open_member is None and any(option.index == other_pattern for option in options):
+                        open_member = (other_index, self._tile_model.patterns[other_pattern])
+                        continue
+                    break
+                else:
+                    if open_member is not None:
+                        if config.DEBUG_LEVEL >= 3:
+                            utils.verbose("Nogood bans pattern %s at %s", 3, open_member[1], self._topology.position(open_member[0]))
+                        self._nogoods.touch(nogood)
+                        self._queue.push(open_member[0])
+                        self._ban(*open_member)
+
+    def _apply_unit_nogoods(self) -> None:
+        """
+        Nogoods consisting of a single pattern don't need any collapsed tile to become active,
+        ban their pattern from every tile whose window fits into the output and propagate the bans
+        before the first tile is collapsed
+        """
+        for nogood in list(self._nogoods):
+            if len(nogood) != 1:
+                continue
+            (row_offset, col_offset, pattern_index), = nogood
+            pattern = self._tile_model.patterns[pattern_index]
+            for index in self._topology.active_tiles:
+                row, col = self._topology.position(index)
+                if pattern in self._wave[index] and self._window_exists(row - row_offset, col - col_offset):
+                    self._queue.push(index)
+                    self._ban(index, pattern)
+        self._propagate()
+
+    def _undo(self, trail_length: int) -> None:
+        """
+        Revert every ban recorded after the first <trail_length> bans of the trail,
+        restoring the patterns in index order and the counters to their previous state
+        """
+        while len(self._trail) > trail_length:
+            index, pattern = self._trail.pop()
+            patterns = self._wave[index]
+            if self._changed is not None:
+                self._changed.add(index)
+            bisect.insort(patterns, pattern, key=operator.attrgetter("index"))
+            remaining = len(patterns)
+            if remaining == 2:
+                self._collapsed_count -= 1
+            elif remaining == 1:
+                self._collapsed_count += 1
+                self._contradiction_count -= 1
+
+    def _backtrack(self) -> None:
+        """
+        Undo the map to the last decision, exclude the pattern chosen there and propagate
+        the exclusion. When that contradicts again the decision before is revisited and so on.
+        Raises UnsolvableException when there is no decision left or the budget of the attempt
+        (config.MAX_BACKTRACKS by default) is exceeded
+        """
+        while True:
+            if not self._decisions:
+                raise UnsolvableException("No decision left to backtrack")
+            maximum = config.MAX_BACKTRACKS if self._budget is None else self._budget
+            if self._backtracks >= maximum:
+                raise UnsolvableException(f"Exceeded the maximum of {maximum} backtracks")
+            trail_length, index, chosen = self._decisions.pop()
+            utils.verbose("Backtracking to %s, excluding pattern %s", 3, self._topology.position(index), chosen)
+            self._backtracks += 1
+            self._queue.clear()
+            self._undo(trail_length)
+            self._pending_singletons.clear()
+            try:
+                self._ban(index, chosen)
+                self._propagate(index)
+                return
+            except UnsolvableException:
+                continue
 
-    def _get_possible_patterns(self, pos: tuple) -> list:
+    def _get_block(self, center: int, block_size: int) -> list:
         """
-        Returns all valid patters at specific position
+        Returns the indices of all active tiles inside the <block_size>x<block_size> block
+        centered at the tile at <center>, the block wraps around for periodic outputs
         """
-        patterns = self._output[pos[0]][pos[1]]
+        topology = self._topology
+        row, col = topology.position(center)
+        block = []
+        for block_row in range(row - block_size // 2, row - block_size // 2 + block_size):
+            for block_col in range(col - block_size // 2, col - block_size // 2 + block_size):
+                if topology.periodic:
+                    block_row, block_col = block_row % topology.height, block_col % topology.width
+                elif not (0 <= block_row < topology.height and 0 <= block_col < topology.width):
+                    continue
+                block.append(block_row * topology.width + block_col)
+        # Small periodic outputs can wrap the block onto itself
+        return [index for index in dict.fromkeys(block) if topology.is_active(index)]
+
+    def _reopen(self, block: list) -> None:
+        """
+        Reset every tile in <block> to contain every possible pattern again(only its pinned pattern for
+        pinned tiles) and queue the tiles surrounding the block, so the next propagation narrows the
+        block down by the fixed tiles around it
+        """
+        patterns = self._tile_model.patterns
+        for index in block:
+            remaining = len(self._wave[index])
+            if remaining == 1:
+                self._collapsed_count -= 1
+            elif remaining == 0:
+                self._contradiction_count -= 1
+            self._wave[index] = list(patterns) if index not in self._pins else [patterns[self._pins[index]]]
+            if len(self._wave[index]) == 1:
+                self._collapsed_count += 1
+
+        if self._changed is not None:
+            self._changed.update(block)
+        block_set = set(block)
+        for index in block:
+            for adjacent_indices in self._topology.neighbors:
+                adjacent_index = adjacent_indices[index]
+                if adjacent_index >= 0 and adjacent_index not in block_set:
+                    self._queue.push(adjacent_index)
+
+    def _repair(self) -> None:
+        """
+        Reset only the block around the tile that ran out of patterns and propagate the
+        surrounding tiles into it. Every time the contradiction happens inside of the
+        previously repaired block again, the block grows by 2 up to config.REPAIR_MAX_BLOCK_SIZE.
+        Raises UnsolvableException when the budget of the attempt(config.MAX_REPAIRS by default) is exceeded
+        """
+        while True:
+            maximum = config.MAX_REPAIRS if self._budget is None else self._budget
+            if self._repairs >= maximum:
+                raise UnsolvableException(f"Exceeded the maximum of {maximum} repairs")
+            if self._contradiction_index in self._repaired_block:
+                self._repair_block_size = min(self._repair_block_size + 2, config.REPAIR_MAX_BLOCK_SIZE)
+            else:
+                self._repair_block_size = config.REPAIR_BLOCK_SIZE
+            block = self._get_block(self._contradiction_index, self._repair_block_size)
+            utils.verbose("Repairing %dx%d block around %s", 3, self._repair_block_size, self._repair_block_size,
+                          self._topology.position(self._contradiction_index))
+            self._repairs += 1
+            self._repaired_block = set(block)
+            self._reopen(block)
+            try:
+                self._propagate()
+                return
+            except UnsolvableException:
+                continue
+
+
+    def _get_possible_patterns(self, index: int) -> list:
+        """
+        Returns all valid patters of the tile at <index>
+        """
+        patterns = self._wave[index]
         if patterns == []:
-            raise UnsolvableException(f"No possible patterns at {pos}")
+            raise UnsolvableException(f"No possible patterns at {self._topology.position(index)}")
         return patterns
 
-    def _get_shannon_entropy(self, pos: tuple) -> float:
+    def _get_shannon_entropy(self, index: int) -> float:
         """
-        Calculate the shannon entropy at a specific position
+        Calculate the shannon entropy of the tile at <index>
         Tiles with only one pattern available have 0 entropy
         """
-        utils.verbose(f"Calculate entropy at {pos}", 3)
+        # Called for every tile on every step, nothing may be built for the message unless it is logged
+        if config.DEBUG_LEVEL >= 3:
+            utils.verbose("Calculate entropy at %s", 3, self._topology.position(index))
         entropy = 0
-        if len(self.output[pos[0]][pos[1]]) == 1 and self.output[pos[0]][pos[1]][0].collapsed:
+        # Tiles narrowed down to a single pattern are final, no matter if they have been
+        # collapsed directly or by propagation, there is nothing left to choose
+        if len(self._wave[index]) == 1:
             return 9999
         
-        if self.output[pos[0]][pos[1]] == []:
+        if self._wave[index] == []:
             raise UnsolvableException()
 
-        for pattern in self.output[pos[0]][pos[1]]:
+        for pattern in self._wave[index]:
             entropy += pattern.probability * math.log(pattern.probability, 2)
         entropy *= -1
 
         # Add some random noise for more natural distribution of collapse
-        entropy -= random.uniform(0, config.ENTROPY_NOISE)
+        entropy -= self._rng.random() * config.ENTROPY_NOISE
         return entropy
     
 
-    def _get_minimum_entropy_position(self) -> tuple:
+    def _get_minimum_entropy_position(self) -> int:
         """
-        Returns the position with the smallest entropy, classical approach of looping over every element 
+        Returns the index of the tile with the smallest entropy, classical approach of looping over every element 
         and overwriting the smallest element when smaller element has been found.
         ! There will be minor differences when entropy table is printed afterwards because        !
         ! of adding a little random offset to every value for a more natural generating algorithm !
         """
-        utils.verbose(f"Calculating position with least entropy", 3)
-        minimum_entropy = self._get_shannon_entropy((0, 0))
-        minimum_entropy_position = (0, 0)
-        for row in range(len(self.output)):
-            for col in range(len(self.output[0])):
-                if (entropy := self._get_shannon_entropy((row, col))) < minimum_entropy:
-                    minimum_entropy = entropy
-                    minimum_entropy_position = (row, col)
+        if config.DEBUG_LEVEL >= 3:
+            utils.verbose("Calculating position with least entropy", 3)
+        active_tiles = self._topology.active_tiles
+        minimum_entropy = self._get_shannon_entropy(active_tiles[0])
+        minimum_entropy_position = active_tiles[0]
+        for index in active_tiles:
+            if (entropy := self._get_shannon_entropy(index)) < minimum_entropy:
+                minimum_entropy = entropy
+                minimum_entropy_position = index
         return minimum_entropy_position       
 
-    def _get_maximum_probability(self, pos: tuple) -> int:
+    def _collapse(self, index: int):
         """
-        Returns the highest probabilty a pattern can have at given position, classical approach of looping 
-        over every element and overwriting the the maximum element when bigger element has been found.
-        Pattern probability is constant for same input
+        Collapse the tile at <index> by randomly choosing one of its patterns weighted by
+        their probability, only the most probable patterns when USE_MAX_PROBABILITY is set
         """
-        utils.verbose(f"Calculating maximum probability at {pos}", 3)
-        maximum_probability = 0
-        for pattern in self.output[pos[0]][pos[1]]:
-            if (probability := pattern.probability) > maximum_probability:
-                maximum_probability = probability
-        return maximum_probability
+        if config.DEBUG_LEVEL >= 3:
+            utils.verbose("Collapsing %s", 3, self._topology.position(index))
+        chosen = self._sampler.sample(self._wave[index], config.USE_MAX_PROBABILITY)
+        self._observations += 1
+        self._stats.observations += 1
+        self._observed_index = index
+        if self._trail is not None:
+            self._decisions.append((len(self._trail), index, chosen))
+        for pattern in [p for p in self._wave[index] if p is not chosen]:
+            self._ban(index, pattern)
 
-    def _collapse(self, pos):
+    def _propagate(self, start: int = None):
         """
-        Collapse the tile at a specific position by taking the most probable patterns
-        and randomly choose one.
+        Remove every pattern that is no longer supported by its neighbors, starting at the tile
+        at <start>(or the already queued tiles) and following every tile that changed on the way
         """
-        utils.verbose(f"Collapsing {pos}", 3)
-        if config.USE_MAX_PROBABILITY:
-            maximum_probability = self._get_maximum_probability(pos)
-            maximum_probability_patterns = [p for p in self.output[pos[0]][pos[1]] if p.probability >= maximum_probability]
-            self.output[pos[0]][pos[1]] = [random.choice(maximum_probability_patterns)]
-        else:
-            self.output[pos[0]][pos[1]] = [random.choice(self.output[pos[0]][pos[1]])]
-        self.output[pos[0]][pos[1]][0].collapsed = True
+        if config.DEBUG_LEVEL >= 3:
+            utils.verbose("Start propagation from %s", 3, self._topology.position(start) if start is not None else "queued tiles")
+        propagate_start = time.perf_counter()
+        queue = self._queue
+        if start is not None:
+            queue.push(start)
+        try:
+            self._propagate_queue()
+        finally:
+            stats = self._stats
+            stats.times[instrumentation.PROPAGATE] += time.perf_counter() - propagate_start
+            stats.max_frontier = max(stats.max_frontier, queue.peak)
 
-    def _propagate(self, start: tuple, size: tuple):
+    def _propagate_queue(self) -> None:
         """
+        Work off the propagation queue, see _propagate
         """
-        utils.verbose(f"Start propagation from {start}", 3)
-        stack = [start]
-        while stack:
-            pos = stack.pop()
-            patterns = self.output[pos[0]][pos[1]]
-            for direction in directions.Directions:
-                if direction.is_valid(pos, size):
-                    adjacent_pos = (pos[0] + direction.value[0], pos[1] + direction.value[1])
-                    
-                    tmp = []
-                    for adjacent_pattern in self.output[adjacent_pos[0]][adjacent_pos[1]]:
-                        possible = any([pattern in self._tile_model.rules[adjacent_pattern][direction.negate()] for pattern in patterns])
-                        
-                        if possible:
-                            tmp.append(adjacent_pattern)
-                        elif adjacent_pos not in stack:
-                            stack.append(adjacent_pos)
-                    self.output[adjacent_pos[0]][adjacent_pos[1]] = tmp 
-                        
+        wave = self._wave
+        neighbors = self._topology.neighbors
+        compatibility = self._tile_model.compatibility
+        queue = self._queue
+        if self._propagation_mode == SWEEP:
+            self._sweep()
+        # Tiles the queue may visit before AUTO switches to a sweep
+        visits_left = config.SWEEP_THRESHOLD * self._number_of_tiles if self._propagation_mode == AUTO else math.inf
+        visits = 0
+        stats = self._stats
+        check_stop = self._stop_event is not None or self._deadline is not None
+        pending_singletons = self._pending_singletons
+        while queue or pending_singletons:
+            if not queue:
+                self._apply_nogoods(pending_singletons.pop())
+                continue
+            visits_left -= 1
+            if visits_left < 0:
+                self._sweep()
+                continue
+            index = queue.pop()
+            visits += 1
+            stats.queue_pops += 1
+            # A long propagation has to notice a stop request or timeout as well, checking every few hundred tiles is enough
+            if check_stop and visits & 255 == 0 and (stopped := self._stop_reason()) is not None:
+                queue.push(index)
+                raise stopped
+            patterns = wave[index]
+            try:
+                for direction_index in range(len(neighbors)):
+                    adjacent_index = neighbors[direction_index][index]
+                    if adjacent_index < 0:
+                        continue
+
+                    allowed = 0
+                    for pattern in patterns:
+                        allowed |= compatibility[direction_index][pattern.index]
+
+                    banned = [p for p in wave[adjacent_index] if not allowed >> p.index & 1]
+                    if banned:
+                        queue.push(adjacent_index)
+                    for adjacent_pattern in banned:
+                        self._ban(adjacent_index, adjacent_pattern)
+            except UnsolvableException:
+                # Not every neighbor has been visited yet, keep the tile queued
+                queue.push(index)
+                raise
                 
+    def _sweep(self) -> None:
+        """
+        Propagate by sweeping over the whole output at once(see dense_wave.propagate_sweep) and ban
+        the removed patterns afterwards, so counters, trail and nogoods stay up to date.
+        Every tile has been propagated afterwards and the queue is empty, on a contradiction the
+        bans after the first emptied tile are dropped
+        """
+        utils.verbose("Sweeping over the whole output", 3)
+        topology = self._topology
+        patterns = self._tile_model.patterns
+        if self._adjacency is None:
+            self._adjacency = dense_wave.build_adjacency(self._tile_model)
+        if self._active is None:
+            self._active = np.array([topology.is_active(index) for index in range(topology.number_of_tiles)]).reshape(topology.height, topology.width)
+
+        before = self._wave_to_array()
+        after = before.reshape(1, topology.height, topology.width, -1).copy()
+        dense_wave.propagate_sweep(after, self._adjacency, topology.periodic, self._active)
+        removed = before & ~after.reshape(before.shape)
+
+        # Like the queue, stop at the first tile running out of patterns, so backtracking and repairing
+        # only have to deal with a single contradiction
+        self._queue.clear()
+        for index in np.flatnonzero(removed.any(axis=1)):
+            for pattern_index in np.flatnonzero(removed[index]):
+                self._ban(int(index), patterns[pattern_index])
+
+    def _stop_reason(self) -> StoppedException:
+        """
+        Returns the exception ending the generation when it has been stopped or has timed out, None otherwise
+        """
+        if self._stop_event is not None and self._stop_event.is_set():
+            return StoppedException()
+        if self._deadline is not None and time.monotonic() >= self._deadline:
+            return StoppedException("Timeout", generation_result.TIMEOUT)
+        return None
+
     def next(self, size: int) -> None:
         """
-        Builds the next step of the output by collapsing and propagating threw every change
+        Builds the next step of the output by collapsing and propagating threw every change.
+        Contradictions are recovered from by backtracking or repairing depending on config.CONTRADICTION_STRATEGY,
+        UnsolvableException is raised when that is not possible and the output has to be initialized again
         """
-        utils.verbose("Starting iteration of collapsing/propagating", 2)
-        solution = []
+        if config.DEBUG_LEVEL >= 2:
+            utils.verbose("Starting iteration of collapsing/propagating", 2)
+        self._observed_index = None
         try:
             if not self._is_fully_collapsed():
+                observe_start = time.perf_counter()
                 minimum_entropy_position = self._get_minimum_entropy_position()
                 self._collapse(minimum_entropy_position)
-                self._propagate(minimum_entropy_position, size)
+                self._stats.times[instrumentation.OBSERVE] += time.perf_counter() - observe_start
+                self._propagate(minimum_entropy_position)
         except UnsolvableException as e:
-            self._init_output(size)
+            if config.CONTRADICTION_STRATEGY == BACKTRACK:
+                self._backtrack()
+            elif config.CONTRADICTION_STRATEGY == REPAIR:
+                self._repair()
+            else:
+                raise e
 
         except Exception as e:
             raise e
 
-    def generate_map(self, size: int) -> bool:
+    def generate_map(self, size: int, periodic: bool = None, mask: list = None,
+                     restart_policy: restart_policy_module.RestartPolicy = None,
+                     parallel_attempts: int = 1, engine: str = None, pins: dict = None, timeout: float = None,
+                     max_steps: int = None, progress=None) -> generation_result.GenerationResult:
         """
         Generate a new bitmap accordingly to the ruleset of tile_model at given size.
-        Do so by collapsing and propagating(next()-method) until the map is completly collapsed
-        Returns True when bitmap has successfully been created, False otherwiese.
+        Do so by collapsing and propagating until the map is completly collapsed on the engine
+        backend selected by <engine>, when an attempt fails the restart policy decides if another one is made.
+        Returns a GenerationResult containing the statistics of every attempt, it evaluates to True
+        when the bitmap has successfully been created, False otherwiese.
+        periodic
+            the map wraps around at its edges, defaults to config.PERIODIC_OUTPUT
+        mask
+            optional 2-dimensional list of booleans of the given size, only tiles set to True are generated
+        restart_policy
+            overrides the restart policy of this instance for this call
+        parallel_attempts
+            number of worker processes racing independently seeded attempts, the first valid
+            output wins and the remaining attempts are stopped
+        engine
+            overrides the engine of this instance for this call
+        pins
+            optional dictionary (row, column) -> pattern index of tiles fixed to a pattern before generating
+        timeout
+            seconds after which the generation is ended, even in the middle of an attempt
+        max_steps
+            observe steps over all attempts after which the generation is ended, not supported with parallel_attempts
+        progress
+            callable(collapsed_tiles, number_of_tiles, elapsed seconds) receiving the progress of the running attempt
+            at most every config.PROGRESS_INTERVAL seconds(pass a progress.ThrottledProgress for other limits),
+            the console progressbar is drawn instead when config.DEBUG_LEVEL >= 1
+        When a limit ends the generation, the result's status is generation_result.TIMEOUT or STEP_LIMIT
+        and its partial_output holds the wave of the attempt that has been running.
+        The times and counters of the call are attached to the result as result.stats
         """
         utils.verbose("Starting wave_function_collapse algortihm", 2)
-        self._init_output(size)
+        if max_steps is not None and parallel_attempts > 1:
+            raise ValueError("max_steps is not supported together with parallel_attempts")
+        policy = restart_policy or self.restart_policy or restart_policy_module.FixedRestarts()
+        self._prepare(size, periodic, mask, pins)
+        self._deadline = None if timeout is None else time.monotonic() + timeout
+        self._max_steps = max_steps
+        self._progress = progress_module.reporter(progress)
+        self._stats = instrumentation.Stats()
+        try:
+            engine = engine or self.engine or self._tuned_settings.get("ENGINE", config.ENGINE)
+            backend = engine_backend.get_backend(engine, self._tile_model, self._topology.number_of_active_tiles)
+            if parallel_attempts > 1:
+                result = self._generate_map_parallel(size, periodic, mask, pins, policy, parallel_attempts, backend.name)
+            else:
+                result = backend.generate_map(self, size, self._topology.periodic, mask, pins, policy)
+            self._stats.restarts = max(0, len(result.attempts) - 1)
+            result.stats = self._stats
+            return result
+        finally:
+            self._deadline = None
+            self._max_steps = None
+            self._progress = None
+
+    async def generate_map_async(self, size: tuple, periodic: bool = None, mask: list = None,
+                                 restart_policy: restart_policy_module.RestartPolicy = None, engine: str = None,
+                                 pins: dict = None, timeout: float = None, max_steps: int = None,
+                                 progress=None) -> generation_result.GenerationResult:
+        """
+        generate_map for asyncio, the generation runs in the default executor of the running event loop so other
+        tasks keep on running. timeout, max_steps and progress behave like they do in generate_map, progress is
+        called from the executor thread. Cancelling the awaiting task stops the generation within a few hundred
+        propagated tiles and raises CancelledError.
+        Returns the same GenerationResult generate_map does
+        """
+        loop = asyncio.get_running_loop()
+        previous_stop_event = self._stop_event
+        self._stop_event = threading.Event()
+        future = loop.run_in_executor(None, functools.partial(self.generate_map, size, periodic, mask, restart_policy=restart_policy,
+                                                              engine=engine, pins=pins, timeout=timeout, max_steps=max_steps,
+                                                              progress=progress))
+        try:
+            return await asyncio.shield(future)
+        except asyncio.CancelledError:
+            self._stop_event.set()
+            # The instance must not be reused before the executor thread has stopped working on it
+            await asyncio.wait([future])
+            raise
+        finally:
+            self._stop_event = previous_stop_event
+
+    def _prepare(self, size: tuple, periodic: bool, mask: list, pins: dict) -> None:
+        """
+        Build the topology, resolve the pins and pick the settings for the next generation. Settings
+        autotuner.tune found for this size take precedence over config.py, they are kept with this
+        instance instead of being written to config.py, so concurrent generations don't interfere
+        """
+        self._build_topology(size, periodic, mask)
+        self._tuned_settings = autotuner.tuned_settings(self._tile_model, size) or {}
+        self._propagation_order = self._tuned_settings.get("PROPAGATION_ORDER", config.PROPAGATION_ORDER)
+        self._propagation_mode = self._tuned_settings.get("PROPAGATION_MODE", config.PROPAGATION_MODE)
+        self._pins = {}
+        for position, pattern_index in (pins or {}).items():
+            index = self._topology.index(position)
+            if not self._topology.is_active(index):
+                raise ValueError(f"Pinned tile {position} is not part of the output")
+            self._pins[index] = pattern_index
+
+    def iter_generate(self, size: tuple, periodic: bool = None, mask: list = None, pins: dict = None,
+                      restart_policy: restart_policy_module.RestartPolicy = None):
+        """
+        Generate like generate_map on the reference engine, but pause after every observe/propagate step and
+        yield a generation_result.StepEvent describing it, so generation can be interleaved with other work.
+        Whenever event.attempt changes the output has been reset. The GenerationResult is the return value
+        of the generator and stored in last_result as soon as it is exhausted, see run_for as well
+        """
+        self._stepper = self._iter_generate(size, periodic, mask, pins, restart_policy)
+        self.last_result = None
+        return self._stepper
+
+    def _iter_generate(self, size: tuple, periodic: bool, mask: list, pins: dict, restart_policy: restart_policy_module.RestartPolicy):
+        policy = restart_policy or self.restart_policy or restart_policy_module.FixedRestarts()
+        self._prepare(size, periodic, mask, pins)
+        result = generation_result.GenerationResult(size, self._seed)
+        position = self._topology.position
+        self._stats = instrumentation.Stats()
+        self._changed = set()
+        try:
+            for attempt in self._run_attempts(size, policy, result):
+                changed, self._changed = self._changed, set()
+                yield generation_result.StepEvent(
+                    attempt=attempt,
+                    step=self._observations,
+                    position=None if self._observed_index is None else position(self._observed_index),
+                    changed=[position(index) for index in sorted(changed)],
+                    collapsed_tiles=self._collapsed_count,
+                    number_of_tiles=self._number_of_tiles,
+                )
+        finally:
+            self._changed = None
+        self._stats.restarts = max(0, len(result.attempts) - 1)
+        result.stats = self._stats
+        self.last_result = result
+        return result
+
+    def run_for(self, budget_ms: float) -> list:
+        """
+        Advance the generation started by iter_generate by as many steps as fit into <budget_ms> milliseconds,
+        at least one. Returns the StepEvents of these steps, last_result is set once the generation has finished
+        """
+        if self._stepper is None:
+            raise NotInitializedException("iter_generate")
+        deadline = time.perf_counter() + budget_ms / 1000
+        events = []
+        for event in self._stepper:
+            events.append(event)
+            if time.perf_counter() >= deadline:
+                break
+        return events
+
+    def regenerate_region(self, output: list, rect: tuple, pins: dict = None, periodic: bool = None,
+                          restart_policy: restart_policy_module.RestartPolicy = None) -> generation_result.GenerationResult:
+        """
+        Regenerate the tiles of a collapsed <output> inside <rect>=(top, left, height, width) in place and keep
+        every other tile. Only the region and a ring of one tile around it are generated, the ring tiles are
+        pinned to their patterns in <output> so the region fits to its surroundings and the cost depends on the
+        size of the region only. Tiles without a pattern(outside of the mask) stay empty.
+        pins
+            optional dictionary (row, column) -> pattern index of tiles inside the region fixed to a pattern
+        periodic
+            the output wraps around at its edges, defaults to config.PERIODIC_OUTPUT
+        Returns the GenerationResult of the region, on success its output is <output> with the region replaced.
+        Afterwards the output property of this instance holds the region with its ring
+        """
+        if periodic is None:
+            periodic = config.PERIODIC_OUTPUT
+        top, left, height, width = rect
+        output_height, output_width = len(output), len(output[0])
+        if top < 0 or left < 0 or top + height > output_height or left + width > output_width:
+            raise ValueError(f"Region {rect} exceeds the output of size {output_height}x{output_width}")
+        utils.verbose("Regenerating %dx%d region at %s", 2, height, width, (top, left))
+
+        mask = [[False] * (width + 2) for _ in range(height + 2)]
+        region_pins = {}
+        for row in range(height + 2):
+            for col in range(width + 2):
+                output_row, output_col = top + row - 1, left + col - 1
+                if periodic:
+                    output_row, output_col = output_row % output_height, output_col % output_width
+                elif not (0 <= output_row < output_height and 0 <= output_col < output_width):
+                    continue
+                patterns = output[output_row][output_col]
+                if not patterns:
+                    continue
+                mask[row][col] = True
+                if not (0 < row <= height and 0 < col <= width):
+                    region_pins[(row, col)] = patterns[0].index
+        for (row, col), pattern_index in (pins or {}).items():
+            if not (top <= row < top + height and left <= col < left + width):
+                raise ValueError(f"Pinned tile {(row, col)} is outside of the region {rect}")
+            region_pins[(row - top + 1, col - left + 1)] = pattern_index
+
+        result = self.generate_map((height + 2, width + 2), False, mask, restart_policy=restart_policy, pins=region_pins)
+        if result:
+            for row in range(height):
+                for col in range(width):
+                    if mask[row + 1][col + 1]:
+                        output[top + row][left + col] = list(result.output[row + 1][col + 1])
+            result.output = output
+        return result
+
+    def _generate_map_reference(self, size: tuple, policy: restart_policy_module.RestartPolicy) -> generation_result.GenerationResult:
+        """
+        Attempts of the reference engine, collapsing and propagating(next()-method) until the map is completly
+        collapsed, see generate_map
+        """
+        result = generation_result.GenerationResult(size, self._seed)
+        for _ in self._run_attempts(size, policy, result):
+            pass
+        return result
+
+    def _run_attempts(self, size: tuple, policy: restart_policy_module.RestartPolicy, result: generation_result.GenerationResult):
+        """
+        Make the attempts of <policy> and record them in <result>, pausing after every step to
+        yield the number of the running attempt
+        """
         start = time.time()
-        tries = 0
-        while tries < config.MAX_TRIES:
+        steps = 0
+        report = self._progress
+        for number, budget in enumerate(policy.attempts(), 1):
+            attempt_start = time.time()
+            reason = ""
+            stopped = False
             try:
+                self._budget = budget
+                self._init_output(size)
                 while not self._is_fully_collapsed():
+                    if policy.expired():
+                        raise UnsolvableException("Restart policy expired")
+                    if (stop := self._stop_reason()) is not None:
+                        raise stop
+                    if self._max_steps is not None and steps >= self._max_steps:
+                        raise StoppedException("Step limit reached", generation_result.STEP_LIMIT)
+                    steps += 1
                     self.next(size)
-                    if config.DEBUG_LEVEL >= 1:
-                        progressbar(self.number_of_collapsed_tiles, size[0]*size[1], bar_lenght=100, text_back=f" {time.time()-start:.2f} sec")
-                return True
+                    if report is not None:
+                        report(self._collapsed_count, self._number_of_tiles, time.time() - start)
+                    yield number
+                result.success = True
             except UnsolvableException as e:       
-                tries += 1
-                print(f"\n{utils.timestring()} Unsolvable, try again [{tries}/{config.MAX_TRIES}]\n")
-                self._init_output(size)
+                reason = str(e)
+                utils.verbose("Unsolvable, try again [%d]", 1, number)
+            except StoppedException as e:
+                # No further attempts either
+                reason = str(e)
+                stopped = True
+                result.stopped = e.status
+                result.partial_output = [[list(patterns) for patterns in row] for row in self.output]
             except Exception as e:
                 raise e 
-        return False    
 
-    def _init_output(self, size: int) -> None:
+            result.attempts.append(generation_result.AttemptStatistics(
+                number=number,
+                success=result.success,
+                steps=self._observations,
+                collapsed_tiles=self._collapsed_count,
+                contradiction_position=None if self._contradiction_index is None else self._topology.position(self._contradiction_index),
+                backtracks=self._backtracks,
+                repairs=self._repairs,
+                elapsed=time.time() - attempt_start,
+                reason=reason,
+            ))
+            if result.success:
+                result.output = self.output
+                break
+            if stopped:
+                break
+        result.elapsed = time.time() - start
+
+    def _generate_map_parallel(self, size: tuple, periodic: bool, mask: list, pins: dict, policy: restart_policy_module.RestartPolicy,
+                               workers: int, engine: str) -> generation_result.GenerationResult:
         """
-        Initialize output map where every tile contains every possible pattern
+        Race the attempts of <policy> in a pool of <workers> processes. Every worker receives the tile model
+        once when it starts and every attempt its own seed spawned from this instance's random generator.
+        As soon as one attempt succeeds all other attempts are stopped and its output is adopted.
+        When a timeout or stop() ends the race, partial_output holds the wave of the stopped attempt
+        that collapsed the most tiles
         """
-        utils.verbose(f"Intializing blank output of size {size}x{size}", 2)
-        self._output = []
-        for y in range(size[0]):
-            self._output.append([])
-            for x in range(size[1]):
-                self._output[-1].append(self._tile_model.patterns)
-    
+        utils.verbose("Racing attempts in %d worker processes", 2, workers)
+        result = generation_result.GenerationResult(size)
+        start = time.time()
+        seed_sequence = np.random.SeedSequence(self._rng.integers(2**63))
+        stop_event = multiprocessing.Event()
+        settings = {name: getattr(config, name) for name in dir(config) if name.isupper()}
+        settings.update(ENGINE=engine, PROPAGATION_ORDER=self._propagation_order, PROPAGATION_MODE=self._propagation_mode)
+        budgets = policy.attempts()
+        with concurrent.futures.ProcessPoolExecutor(workers, initializer=_init_worker,
+                                                    initargs=(self._tile_model, stop_event, settings)) as executor:
+            running = set()
+            partial_output = None
+            def submit() -> bool:
+                try:
+                    budget = next(budgets)
+                except StopIteration:
+                    return False
+                running.add(executor.submit(_run_attempt, size, periodic, mask, pins, seed_sequence.spawn(1)[0], budget))
+                return True
+
+            while len(running) < workers and submit():
+                pass
+            while running and not result.success:
+                done, running = concurrent.futures.wait(running, timeout=0.1, return_when=concurrent.futures.FIRST_COMPLETED)
+                if policy.expired():
+                    stop_event.set()
+                elif (stop := self._stop_reason()) is not None:
+                    result.stopped = stop.status
+                    stop_message = str(stop)
+                    stop_event.set()
+                for future in done:
+                    attempt_result = future.result()
+                    self._stats.merge(attempt_result.stats)
+                    for attempt in attempt_result.attempts:
+                        attempt.number = len(result.attempts) + 1
+                        result.attempts.append(attempt)
+                    if attempt_result.success and not result.success:
+                        result.success = True
+                        result.output = self._tile_model.from_indices(attempt_result.output)
+                    elif attempt_result.partial_output is not None and \
+                            (partial_output is None or _collapsed(attempt_result.partial_output) > _collapsed(partial_output)):
+                        partial_output = attempt_result.partial_output
+                    elif not result.success and not stop_event.is_set():
+                        submit()
+            stop_event.set()
+            executor.shutdown(wait=True, cancel_futures=True)
+
+        if result.success:
+            self._adopt_output(result.output)
+        elif result.stopped is not None:
+            # The workers were stopped through the shared event and don't know why
+            for attempt in result.attempts:
+                if attempt.reason == str(StoppedException()):
+                    attempt.reason = stop_message
+            if partial_output is not None:
+                result.partial_output = self._tile_model.from_index_lists(partial_output)
+        result.elapsed = time.time() - start
+        return result
+
+    def _adopt_output(self, output: list) -> None:
+        """
+        Make a collapsed output generated somewhere else the output of this instance
+        """
+        self._init_output(self._topology.size, apply_constraints=False)
+        self._wave = [list(patterns) for row in output for patterns in row]
+        self._collapsed_count = self._number_of_tiles
+
+    def _build_topology(self, size: tuple, periodic: bool = None, mask: list = None) -> topology.Topology:
+        """
+        Returns the topology for an output of the given size, it is only rebuilt when
+        size, wrap-around or mask differ from the previous one
+        """
+        if periodic is None:
+            periodic = config.PERIODIC_OUTPUT
+        if self._topology is None or not self._topology.matches(size, periodic, mask):
+            utils.verbose("Building topology of size %dx%d", 2, size[0], size[1])
+            self._topology = topology.Topology(size, periodic, mask)
+            self._active = None
+        return self._topology
+
+    def _init_output(self, size: int, apply_constraints: bool = True) -> None:
+        """
+        Initialize output map where every tile contains every possible pattern,
+        tiles outside of the mask don't contain any pattern. Pins and unit nogoods are
+        applied and propagated unless <apply_constraints> is False
+        """
+        utils.verbose("Intializing blank output of size %s", 2, size)
+        if self._topology is None or self._topology.size != tuple(size):
+            self._build_topology(size)
+        patterns = self._tile_model.patterns
+        self._wave = [list(patterns) if self._topology.is_active(index) else [] for index in range(self._topology.number_of_tiles)]
+
+        self._number_of_tiles = self._topology.number_of_active_tiles
+        self._collapsed_count = self._number_of_tiles if len(patterns) == 1 else 0
+        self._contradiction_count = 0
+        self._observations = 0
+
+        self._trail = [] if config.CONTRADICTION_STRATEGY == BACKTRACK else None
+        self._decisions = []
+        self._backtracks = 0
+
+        self._contradiction_index = None
+        self._repairs = 0
+        self._repair_block_size = 0
+        self._repaired_block = set()
+        self._pending_singletons.clear()
+
+        capacity = self._topology.number_of_tiles
+        if self._queue is None or self._queue.capacity != capacity or self._queue.order != self._propagation_order:
+            self._queue = propagation_queue.PropagationQueue(capacity, self._propagation_order)
+        else:
+            self._queue.clear()
+            # The largest frontier is reported per generation, see instrumentation.Stats
+            self._queue.peak = 0
+
+        if not apply_constraints:
+            return
+        # Pins and unit nogoods lead to the same starting wave every time, it is propagated only once
+        unit_nogoods = frozenset(nogood for nogood in self._nogoods if len(nogood) == 1) if self._nogoods is not None else frozenset()
+        if not self._pins and not unit_nogoods:
+            return
+        topology = self._topology
+        key = initial_wave_cache.constraints_key(topology.size, topology.periodic, None if topology.mask is None else bytes(topology.mask),
+                                                 self._pins, unit_nogoods)
+        cached = initial_wave_cache.initial_waves.get(self._tile_model, key)
+        if cached is not None:
+            utils.verbose("Starting from cached initial wave", 3)
+            self._load_wave(cached)
+            return
+        self._apply_pins()
+        if unit_nogoods:
+            self._apply_unit_nogoods()
+        initial_wave_cache.initial_waves.put(self._tile_model, key, self._wave_to_array())
+
+    def _wave_to_array(self) -> np.ndarray:
+        """
+        Returns the wave as boolean array (tiles, patterns)
+        """
+        wave = np.zeros((len(self._wave), len(self._tile_model.patterns)), dtype=bool)
+        for index, options in enumerate(self._wave):
+            wave[index, [pattern.index for pattern in options]] = True
+        return wave
+
+    def _load_wave(self, wave: np.ndarray) -> None:
+        """
+        Replace the wave by a boolean array (tiles, patterns) that is free of contradictions,
+        tiles outside of the mask stay empty whatever the array holds for them
+        """
+        patterns = self._tile_model.patterns
+        is_active = self._topology.is_active
+        remaining = wave.sum(axis=1)
+        self._wave = [[] if not is_active(index)
+                      else list(patterns) if count == len(patterns) else [patterns[pattern_index] for pattern_index in np.flatnonzero(options)]
+                      for index, (count, options) in enumerate(zip(remaining, wave))]
+        self._collapsed_count = sum(1 for options in self._wave if len(options) == 1)
+
+    def _apply_pins(self) -> None:
+        """
+        Ban every pattern but the pinned one from the pinned tiles and propagate the bans
+        """
+        if not self._pins:
+            return
+        for index, pattern_index in self._pins.items():
+            for pattern in [p for p in self._wave[index] if p.index != pattern_index]:
+                self._queue.push(index)
+                self._ban(index, pattern)
+        self._propagate()
+
     def __str__(self):
         result = ""
-        for line in self._output:
+        for line in self.output:
             try:
-                result = f"{result}{list(map(lambda x: '<>' if len(x) > 1 else '{:2d}'.format(x[0].index), line))}\n"
-            except IndexError as e:
-                raise UnsolvableException()
+                result = f"{result}{list(map(lambda x: '<>' if len(x) > 1 else '{:2d}'.format(x[0].index) if x else '  ', line))}\n"
             except Exception as e:
                 raise e
         return result
 
+# Tile model, generator and stop event of a worker process, set once per worker by _init_worker
+_worker_tile_model = None
+_worker_generator = None
+_worker_stop_event = None
+
+def _init_worker(tile_model: tile_model.TileModel, stop_event, settings: dict) -> None:
+    global _worker_tile_model, _worker_generator, _worker_stop_event
+    for name, value in settings.items():
+        setattr(config, name, value)
+    # Workers don't write progress to the shared terminal
+    config.DEBUG_LEVEL = 0
+    _worker_tile_model = tile_model
+    # One generator per worker, so topology and queue are reused between jobs of the same size
+    _worker_generator = WaveFunctionCollapse(tile_model)
+    _worker_generator._stop_event = stop_event
+    _worker_stop_event = stop_event
+
+def _run_attempt(size: tuple, periodic: bool, mask: list, pins: dict, seed, budget: int) -> generation_result.GenerationResult:
+    """
+    Run a single attempt inside a worker process, the output is sent back as pattern indices
+    """
+    return _run_job(size, periodic, mask, seed, restart_policy_module.FixedRestarts(1, budget), pins)
+
+def _run_job(size: tuple, periodic: bool, mask: list, seed, policy: restart_policy_module.RestartPolicy,
+             pins: dict = None) -> generation_result.GenerationResult:
+    """
+    Generate an output inside a worker process, the output is sent back as pattern indices
+    and a partial output as lists of pattern indices
+    """
+    _worker_generator.reseed(seed)
+    result = _worker_generator.generate_map(size, periodic, mask, restart_policy=policy, pins=pins)
+    if result.output is not None:
+        result.output = _worker_tile_model.to_indices(result.output)
+    if result.partial_output is not None:
+        result.partial_output = _worker_tile_model.to_index_lists(result.partial_output)
+    return result
+
+def _collapsed(index_lists: list) -> int:
+    """
+    Number of tiles of a partial output sent back by a worker that hold a single pattern
+    """
+    return sum(len(indices) == 1 for row in index_lists for indices in row)
+
+def generate_batch(tile_model: tile_model.TileModel, size: tuple, seeds, workers: int = None, periodic: bool = None,
+                   mask: list = None, restart_policy: restart_policy_module.RestartPolicy = None, root_seed: int = None,
+                   engine: str = None):
+    """
+    Generate one output per seed in a pool of <workers> processes(os.cpu_count() by default) and yield
+    the GenerationResults in the order they finish. result.seed tells which seed an output belongs to,
+    WaveFunctionCollapse(tile_model, seed=result.seed).generate_map(size) regenerates it exactly.
+    seeds
+        iterable of integer seeds or the number of outputs, their seeds are then spawned from
+        numpy.random.SeedSequence(root_seed) so every job gets an independent random stream
+    engine
+        backend the workers run on, defaults to config.ENGINE
+    """
+    if isinstance(seeds, int):
+        seed_sequence = np.random.SeedSequence(root_seed)
+        seeds = [int(child.generate_state(1, np.uint64)[0]) for child in seed_sequence.spawn(seeds)]
+    seeds = iter(seeds)
+    workers = workers or os.cpu_count() or 1
+    utils.verbose("Generating batch in %d worker processes", 1, workers)
+
+    stop_event = multiprocessing.Event()
+    settings = {name: getattr(config, name) for name in dir(config) if name.isupper()}
+    if engine is not None:
+        settings["ENGINE"] = engine
+    with concurrent.futures.ProcessPoolExecutor(workers, initializer=_init_worker,
+                                                initargs=(tile_model, stop_event, settings)) as executor:
+        running = set()
+        try:
+            # Keep a few jobs queued per worker instead of submitting all seeds upfront
+            for seed in seeds:
+                running.add(executor.submit(_run_job, size, periodic, mask, seed, restart_policy))
+                if len(running) >= 2 * workers:
+                    break
+            while running:
+                done, running = concurrent.futures.wait(running, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    result = future.result()
+                    if result.output is not None:
+                        result.output = tile_model.from_indices(result.output)
+                    if result.partial_output is not None:
+                        result.partial_output = tile_model.from_index_lists(result.partial_output)
+                    for seed in seeds:
+                        running.add(executor.submit(_run_job, size, periodic, mask, seed, restart_policy))
+                        break
+                    yield result
+        finally:
+            # Stop everything still running when the consumer stops iterating early
+            stop_event.set()
+            executor.shutdown(wait=True, cancel_futures=True)
+
+
 if __name__ == "__main__":
     filenames = [
         "../resources/images/example4x4.png",
@@ -0,0 +1,136 @@
+#! /usr/bin/python3
+
+import os
+import tempfile
+import collections
+
+import numpy as np
+
+import tile_model
+import wave_function_collapse
+import utils
+
+class World(object):
+    """
+    Open-ended map made of equally sized chunks which are generated on demand. A new chunk is generated
+    with a ring of one tile around it, the ring tiles belonging to already generated neighbor chunks are
+    pinned to their patterns so the overlap rules hold across the seams, the other ring tiles are masked out.
+    At most <cache_size> chunks are kept in memory(least recently used are spilled first), the others are
+    stored as .npy arrays of pattern indices in <directory>
+    """
+    def __init__(self, tile_model: tile_model.TileModel, chunk_size: tuple = (32, 32), seed: int = 0,
+                 cache_size: int = 64, directory: str = None, max_retries: int = 10):
+        """
+        seed
+            every chunk is generated from a seed derived from <seed> and its coordinates
+        directory
+            where spilled chunks are stored, a new temporary directory by default
+        max_retries
+            a chunk whose generate_map call fails(config.MAX_TRIES attempts) is retried up to <max_retries>
+            times, every retry with a fresh seed derived from the chunk's seed
+        """
+        self._tile_model = tile_model
+        self.chunk_size = tuple(chunk_size)
+        self.seed = seed
+        self.cache_size = cache_size
+        self.directory = directory or tempfile.mkdtemp(prefix="wfc_world_")
+        self.max_retries = max_retries
+        os.makedirs(self.directory, exist_ok=True)
+        # (cx, cy) -> pattern indices of the chunk as array (rows, columns)
+        self._chunks = collections.OrderedDict()
+        self._dtype = np.min_scalar_type(max(0, len(tile_model.patterns) - 1))
+
+    def get_chunk(self, cx: int, cy: int) -> np.ndarray:
+        """
+        Returns the pattern indices of the chunk at column <cx> and row <cy> as read-only array (rows, columns),
+        tile_model.from_indices(chunk.tolist()) turns it into pattern lists
+        Raises wave_function_collapse.UnsolvableException when the chunk can't be fitted to its neighbors
+        """
+        chunk = self._lookup(cx, cy)
+        if chunk is None:
+            chunk = self._generate(cx, cy)
+            self._store(cx, cy, chunk)
+        return chunk
+
+    def has_chunk(self, cx: int, cy: int) -> bool:
+        return (cx, cy) in self._chunks or os.path.exists(self._filename(cx, cy))
+
+    def flush(self) -> None:
+        """
+        Write every chunk held in memory to the directory
+        """
+        for (cx, cy), chunk in self._chunks.items():
+            if not os.path.exists(self._filename(cx, cy)):
+                np.save(self._filename(cx, cy), chunk)
+
+    def _filename(self, cx: int, cy: int) -> str:
+        return os.path.join(self.directory, f"chunk_{cx}_{cy}.npy")
+
+    def _lookup(self, cx: int, cy: int) -> np.ndarray:
+        """
+        Returns the chunk from memory or disk, None when it has not been generated yet
+        """
+        if (cx, cy) in self._chunks:
+            self._chunks.move_to_end((cx, cy))
+            return self._chunks[(cx, cy)]
+        if os.path.exists(self._filename(cx, cy)):
+            chunk = np.load(self._filename(cx, cy))
+            chunk.flags.writeable = False
+            self._store(cx, cy, chunk)
+            return chunk
+        return None
+
+    def _store(self, cx: int, cy: int, chunk: np.ndarray) -> None:
+        self._chunks[(cx, cy)] = chunk
+        while len(self._chunks) > self.cache_size:
+            (spilled_cx, spilled_cy), spilled = self._chunks.popitem(last=False)
+            # Chunks never change, one loaded from disk doesn't have to be written again
+            if not os.path.exists(self._filename(spilled_cx, spilled_cy)):
+                utils.verbose("Spilling chunk (%d, %d) to disk", 3, spilled_cx, spilled_cy)
+                np.save(self._filename(spilled_cx, spilled_cy), spilled)
+
+    def _chunk_seed(self, cx: int, cy: int) -> np.random.SeedSequence:
+        # SeedSequence only takes non-negative integers, interleave negative and positive coordinates
+        return np.random.SeedSequence([self.seed, 2 * cx if cx >= 0 else -2 * cx - 1, 2 * cy if cy >= 0 else -2 * cy - 1])
+
+    def _generate(self, cx: int, cy: int) -> np.ndarray:
+        """
+        Generate the chunk at (cx, cy) constrained by the borders of its generated neighbors
+        """
+        utils.verbose("Generating chunk (%d, %d)", 2, cx, cy)
+        height, width = self.chunk_size
+        mask = [[0 < row <= height and 0 < col <= width for col in range(width + 2)] for row in range(height + 2)]
+        pins = {}
+        for row_offset in (-1, 0, 1):
+            for col_offset in (-1, 0, 1):
+                if row_offset == col_offset == 0:
+                    continue
+                neighbor = self._lookup(cx + col_offset, cy + row_offset)
+                if neighbor is None:
+                    continue
+                # Ring rows/columns next to the neighbor and the matching rows/columns inside the neighbor
+                rows = {-1: [(0, height - 1)], 0: [(row, row - 1) for row in range(1, height + 1)], 1: [(height + 1, 0)]}[row_offset]
+                cols = {-1: [(0, width - 1)], 0: [(col, col - 1) for col in range(1, width + 1)], 1: [(width + 1, 0)]}[col_offset]
+                for row, neighbor_row in rows:
+                    for col, neighbor_col in cols:
+                        mask[row][col] = True
+                        pins[(row, col)] = int(neighbor[neighbor_row, neighbor_col])
+
+        # Retry seeds are spawned from the chunk's seed, so a retried chunk is the same every time as well
+        seed = self._chunk_seed(cx, cy)
+        generator = wave_function_collapse.WaveFunctionCollapse(self._tile_model)
+        for retry_seed in [seed] + seed.spawn(self.max_retries):
+            generator.reseed(retry_seed)
+            result = generator.generate_map((height + 2, width + 2), periodic=False, mask=mask, pins=pins)
+            if result:
+                break
+            utils.verbose("Chunk (%d, %d) failed, retrying with a new seed", 2, cx, cy)
+        else:
+            if pins:
+                raise wave_function_collapse.UnsolvableException(
+                    f"Chunk ({cx}, {cy}) does not fit to its neighbors within {self.max_retries + 1} tries")
+            raise wave_function_collapse.UnsolvableException(
+                f"Chunk ({cx}, {cy}) could not be generated within {self.max_retries + 1} tries, raise max_retries or config.MAX_TRIES")
+        chunk = np.array(self._tile_model.to_indices(result.output))[1:-1, 1:-1].astype(self._dtype)
+        chunk.flags.writeable = False
+        return chunk